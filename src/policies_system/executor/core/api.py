@@ -1,7 +1,10 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import requests
 import os
+import json
 from .executor import MultiprocessingPolicyRuleExecutor
+from .execution_store import execution_store, ExecutionStoreFull
+from .result_transport import batch_envelope
 from .function_infra import PolicyFunctionInfra
 from .job_infra import PolicyJobInfra
 from .output_listener import start_output_listener
@@ -19,8 +22,47 @@ namespace = "policies"
 default_port = 5000
 
 
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"success": True, "message": "ok"}), 200
+
+
+def _result_response(payload, status_code: int, **fields):
+    # the worker already produced the JSON of the output, it is written
+    # into the envelope as is instead of being decoded and encoded again
+    head = json.dumps(dict({"success": True}, **fields))[:-1] + ', "data": '
+
+    def envelope():
+        yield head.encode()
+        yield from payload.iter_chunks()
+        yield b'}'
+
+    return Response(envelope(), status=status_code, mimetype="application/json")
+
+
+def _execution_response(handle):
+    if not handle.done():
+        return jsonify({
+            "success": True,
+            "execution_id": handle.task_id,
+            "status": "running"
+        }), 202
+
+    payload = handle.get_payload()
+    # kept in memory, the result can be fetched again until it expires
+    payload.to_bytes()
+    return _result_response(
+        payload, 200, execution_id=handle.task_id, status="completed")
+
+
 @app.route('/execute_policy', methods=['POST'])
 def execute_policy():
+    """Runs a policy and returns its output.
+
+    With "async": true in the body (or ?async=true) the execution id is
+    returned right away; the result is then read from
+    /execute_policy/<execution_id> or /execute_policy/<execution_id>/wait.
+    """
 
     try:
         # Parse the incoming JSON request
@@ -39,17 +81,89 @@ def execute_policy():
                 "message": "Missing required fields: 'policy_rule_uri' and/or 'input_data'."
             }), 400
 
+        is_async = data.get("async") or request.args.get("async", "false").lower() == "true"
+        if is_async:
+            # refuse before submitting, a refused execution must not run
+            execution_store.reserve()
+
         # Execute the policy
-        result_queue = policy_executor.execute(
-            policy_rule_uri, parameters, input_data)
+        try:
+            handle = policy_executor.execute(
+                policy_rule_uri, parameters, input_data)
+        except Exception:
+            if is_async:
+                execution_store.release_reservation()
+            raise
+
+        if is_async:
+            execution_store.add(handle)
+            response, status_code = _execution_response(handle)
+            response.headers["Location"] = f"/execute_policy/{handle.task_id}"
+            return response, status_code
+
+        return _result_response(handle.get_payload(), 202)
+
+    except ExecutionStoreFull as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        output = result_queue.get()
 
-        return jsonify({
-            "success": True,
-            "data": output
-        }), 202
+@app.route('/execute_policy/batch', methods=['POST'])
+def execute_policy_batch():
+    """Evaluates one policy against a list of inputs, outputs are returned in input order.
+
+    The inputs are split into chunks run across the worker pool; each chunk
+    goes through the policy's eval_batch when it has one.
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "message": "Invalid or missing JSON body"}), 400
+
+        policy_rule_uri = data.get("policy_rule_uri")
+        inputs = data.get("inputs")
+        parameters = data.get("parameters", None)  # Optional
 
+        if not policy_rule_uri or not inputs or not isinstance(inputs, list):
+            return jsonify({
+                "success": False,
+                "message": "Missing required fields: 'policy_rule_uri' and/or 'inputs' (a non-empty list)."
+            }), 400
+
+        chunks = policy_executor.execute_batch(
+            policy_rule_uri, parameters, inputs)
+
+        return Response(batch_envelope(chunks), status=202, mimetype="application/json")
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/execute_policy/<execution_id>', methods=['GET'])
+def get_execution(execution_id):
+    try:
+        handle = execution_store.get(execution_id)
+        if handle is None:
+            return jsonify({"success": False, "message": f"Execution '{execution_id}' not found or expired"}), 404
+        return _execution_response(handle)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/execute_policy/<execution_id>/wait', methods=['GET'])
+def wait_for_execution(execution_id):
+    """Long poll: returns once the execution finishes or ?timeout= seconds pass."""
+    try:
+        handle = execution_store.get(execution_id)
+        if handle is None:
+            return jsonify({"success": False, "message": f"Execution '{execution_id}' not found or expired"}), 404
+
+        timeout = float(request.args.get("timeout", "30"))
+        timeout = max(0.0, min(timeout, float(
+            os.getenv("EXECUTION_WAIT_MAX_TIMEOUT", "300"))))
+        handle.wait(timeout)
+        return _execution_response(handle)
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
@@ -202,6 +316,39 @@ def create_job_endpoint():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@app.route('/create_jobs', methods=['POST'])
+def create_jobs_endpoint():
+    try:
+        jobs = request.get_json().get('jobs', [])
+        redis_host = os.getenv("JOB_MANAGER_URL", "localhost")
+        redis_queue_name = "JOB_OUTPUTS"
+
+        job_manager = PolicyJobInfra()
+
+        results = []
+        for job in jobs:
+            try:
+                job_manager.create_job(
+                    name=job['name'],
+                    policy_rule_uri=job['policy_rule_uri'],
+                    job_id=job['job_id'],
+                    redis_host=redis_host,
+                    redis_queue_name=redis_queue_name,
+                    policy_rule_parameters=job.get('policy_rule_parameters', None),
+                    node_selector=job.get('node_selector', None),
+                    inputs=job.get('inputs', {})
+                )
+                results.append({"success": True, "job_id": job['job_id']})
+            except Exception as e:
+                logging.error(f"Error creating job '{job.get('name')}': {e}")
+                results.append({"success": False, "job_id": job.get('job_id'), "message": str(e)})
+
+        return jsonify({"success": True, "data": results}), 201
+    except Exception as e:
+        logging.error(f"Error in create_jobs endpoint: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 @app.route('/create_job_with_estimate', methods=['POST'])
 def create_job_with_estimate():
     try:
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+import tarfile
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False):
+    """flock based lock shared by every process on the node."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class ArtifactLease:
+    """A cached tree held in use; it is not evicted until released.
+
+    The lease keeps a shared flock on the entry, so it is also dropped when
+    the process holding it exits.
+    """
+
+    def __init__(self, key: str, path: Path, lock_file):
+        self.key = key
+        self.path = path
+        self._lock_file = lock_file
+
+    def release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def __del__(self):
+        self.release()
+
+
+class ArtifactCache:
+    """Node level, content addressed store of extracted policy archives.
+
+    objects/<key>/   extracted trees, key = sha256 of the archive content
+    index/<url>.json ETag and key last seen for a URL
+    locks/<key>.lock flock per entry: exclusive to create or evict, shared while in use
+    tmp/             downloads and extractions, renamed into objects/ once complete
+
+    Remote archives are fetched with If-None-Match against the recorded
+    ETag, so a policy version is downloaded and extracted once per node.
+    Entries are evicted least recently used first when the store grows
+    beyond `max_bytes`, skipping entries that are in use.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        self.index_dir = self.root / "index"
+        self.locks_dir = self.root / "locks"
+        self.tmp_dir = self.root / "tmp"
+
+    def _ensure_dirs(self):
+        for path in (self.objects_dir, self.index_dir, self.locks_dir, self.tmp_dir):
+            path.mkdir(parents=True, exist_ok=True)
+
+    def _lock_path(self, key: str) -> Path:
+        return self.locks_dir / f"{key}.lock"
+
+    def _read_index(self, url: str) -> Optional[dict]:
+        try:
+            with open(self.index_dir / f"{_sha256(url)}.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_index(self, url: str, etag: Optional[str], key: str):
+        tmp_path = self.tmp_dir / f"index-{uuid.uuid4()}"
+        with open(tmp_path, "w") as f:
+            json.dump({"url": url, "etag": etag, "key": key}, f)
+        os.replace(tmp_path, self.index_dir / f"{_sha256(url)}.json")
+
+    def _download(self, url: str, etag: Optional[str]):
+        """Returns (archive_path, key, etag), archive_path is None when not modified."""
+        headers = {"If-None-Match": etag} if etag else {}
+        response = requests.get(url, stream=True, headers=headers,
+                                timeout=float(os.getenv("ARTIFACT_DOWNLOAD_TIMEOUT", "300")))
+        if response.status_code == 304:
+            return None, None, etag
+        response.raise_for_status()
+
+        archive_path = self.tmp_dir / f"download-{uuid.uuid4()}"
+        digest = hashlib.sha256()
+        try:
+            with open(archive_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    digest.update(chunk)
+                    f.write(chunk)
+        except Exception:
+            archive_path.unlink(missing_ok=True)
+            raise
+        return archive_path, digest.hexdigest(), response.headers.get("ETag")
+
+    def _lease(self, key: str) -> Optional[ArtifactLease]:
+        lock_file = open(self._lock_path(key), "a")
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        path = self.objects_dir / key
+        if not path.is_dir():
+            lock_file.close()
+            return None
+        os.utime(path)  # recency for eviction
+        return ArtifactLease(key, path, lock_file)
+
+    def _extract(self, archive_path: Path, key: str):
+        with file_lock(self._lock_path(key)):
+            if (self.objects_dir / key).is_dir():
+                return
+
+            staging = self.tmp_dir / f"extract-{key}-{uuid.uuid4()}"
+            staging.mkdir()
+            try:
+                if tarfile.is_tarfile(archive_path):
+                    with tarfile.open(archive_path) as tar:
+                        tar.extractall(staging)
+                elif zipfile.is_zipfile(archive_path):
+                    with zipfile.ZipFile(archive_path, "r") as zip_ref:
+                        zip_ref.extractall(staging)
+                else:
+                    raise ValueError("Unsupported file format")
+                if not (staging / "code").is_dir():
+                    raise FileNotFoundError(
+                        "code/ directory not found in archive")
+                os.rename(staging, self.objects_dir / key)
+                logger.info(f"Extracted artifact {key}")
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def fetch(self, location: str) -> ArtifactLease:
+        """Returns a lease on the extracted tree of a local or remote archive.
+
+        The tree contains the archive's code/ directory.
+        """
+        self._ensure_dirs()
+        archive_path = None
+        try:
+            local_path = Path(location)
+            if local_path.is_file():
+                key = _file_sha256(local_path)
+                lease = self._lease(key)
+                if lease:
+                    return lease
+                self._extract(local_path, key)
+            else:
+                entry = self._read_index(location) or {}
+                archive_path, key, etag = self._download(
+                    location, entry.get("etag"))
+                if archive_path is None:
+                    key = entry["key"]
+                    lease = self._lease(key)
+                    if lease:
+                        logger.info(f"Artifact for {location} not modified, using cache")
+                        return lease
+                    # recorded entry was evicted, fetch it again unconditionally
+                    archive_path, key, etag = self._download(location, None)
+
+                self._write_index(location, etag, key)
+                lease = self._lease(key)
+                if lease:
+                    return lease
+                self._extract(archive_path, key)
+
+            lease = self._lease(key)
+            if lease is None:
+                raise RuntimeError(f"Artifact {key} was evicted while being fetched")
+            self.evict()
+            return lease
+        finally:
+            if archive_path is not None:
+                archive_path.unlink(missing_ok=True)
+
+    def evict(self):
+        """Removes least recently used entries until the store fits in max_bytes."""
+        if self.max_bytes <= 0:
+            return
+
+        entries = []
+        for path in self.objects_dir.iterdir():
+            try:
+                entries.append((path.stat().st_mtime, path, _tree_size(path)))
+            except OSError:
+                continue
+        total = sum(size for _, _, size in entries)
+
+        for _, path, size in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            with open(self._lock_path(path.name), "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # in use
+                trash = self.tmp_dir / f"evict-{path.name}-{uuid.uuid4()}"
+                try:
+                    os.rename(path, trash)
+                except OSError:
+                    continue
+            shutil.rmtree(trash, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted artifact {path.name} ({size} bytes)")
+
+        # leftovers of processes that died mid download or extraction
+        cutoff = time.time() - float(os.getenv("ARTIFACT_TMP_MAX_AGE", "3600"))
+        for path in self.tmp_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    if path.is_dir():
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+artifact_cache = ArtifactCache(
+    root=os.getenv("ARTIFACT_CACHE_DIR", "/tmp/policy-artifacts"),
+    max_bytes=int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(5 * 1024 ** 3))))
@@ -1,108 +1,83 @@
-import os
-import uuid
-import tempfile
 import requests
 import subprocess
-import tarfile
-import zipfile
 import importlib.util
 import sys
 import logging
 from pathlib import Path
-import hashlib
-import shutil
+
+from .artifact_cache import artifact_cache
+from .dependency_cache import dependency_cache, requirements_hash
 
 
 logging.basicConfig(level=logging.INFO)
 
+ARCHIVE_SUFFIXES = [".gz", ".zip", ".xz", ".tgz"]
+
 
 class LocalCodeExecutor:
     def __init__(self, download_url: str, settings: dict, parameters: dict):
         self.download_url = download_url
-        self.session_uuid = str(uuid.uuid4())
-        self.temp_dir = Path(f"/tmp/{self.session_uuid}")
-        self.code_dir = self.temp_dir / "code"
-        self.requirements_file = self.code_dir / "requirements.txt"
-        self.function_file = self.code_dir / "function.py"
+        self.artifact = None
+        self.code_dir = None
+        self.requirements_file = None
+        self.function_file = None
         self.function_class = None
         self.settings = settings
         self.parameters = parameters
-        self.cache = {}
+
+    def _use_code_dir(self, code_dir: Path):
+        self.code_dir = code_dir
+        self.requirements_file = self.code_dir / "requirements.txt"
+        self.function_file = self.code_dir / "function.py"
 
     def download(self):
-        # Check if the path is a local file or directory
-        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        # Local directories are used in place, archives (local or remote) go
+        # through the node's artifact cache which also extracts them
         target_path = Path(self.download_url)
 
-        print(target_path, target_path.exists())
-
-        if target_path.exists():
-            if target_path.is_file() and (target_path.suffix in [".gz", ".zip", ".xz"] or target_path.suffixes[-2:] == [".tar", ".gz"]):
-                logging.info(f"Using local archive: {target_path}")
-                return target_path
-            elif target_path.is_dir():
-                logging.info(f"Using local directory: {target_path}")
-                self.code_dir.mkdir(parents=True, exist_ok=True)
-                shutil.copytree(target_path, self.code_dir, dirs_exist_ok=True)
-                logging.info(f"Copied local directory to {self.code_dir}")
-                return None  # No need to unpack or download
-            else:
-                raise ValueError(
-                    "Unsupported local path format or non-existing path")
-
-        # Handle remote downloads
-        url_hash = hashlib.md5(self.download_url.encode()).hexdigest()
-        if url_hash in self.cache:
-            logging.info("Loading from cache")
-            cached_path = Path(self.cache.get(url_hash))
-            if cached_path.exists():
-                return cached_path
+        if target_path.is_dir():
+            logging.info(f"Using local directory: {target_path}")
+            self._use_code_dir(target_path)
+            return None
+        if target_path.exists() and target_path.suffix not in ARCHIVE_SUFFIXES:
+            raise ValueError(
+                "Unsupported local path format or non-existing path")
 
         try:
-            response = requests.get(self.download_url, stream=True)
-            response.raise_for_status()
-            archive_path = self.temp_dir / "archive"
-            with open(archive_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            self.cache[url_hash] = str(archive_path)
-            logging.info(f"Downloaded and cached file to {archive_path}")
-            return archive_path
+            self.artifact = artifact_cache.fetch(self.download_url)
+            self._use_code_dir(self.artifact.path / "code")
+            logging.info(f"Using cached artifact {self.artifact.key}")
+            return None
         except requests.exceptions.RequestException as e:
             logging.error(f"Error downloading file: {e}")
             raise
 
     def unpack(self, archive_path):
         if not archive_path:
-            # If archive_path is None, it means the code was copied directly from a directory
+            # download() already hands out an extracted tree
             logging.info(
                 "No extraction needed (code directory already populated)")
             return
 
         try:
-            if tarfile.is_tarfile(archive_path):
-                with tarfile.open(archive_path) as tar:
-                    tar.extractall(self.temp_dir)
-                    logging.info(f"Extracted tar file to {self.temp_dir}")
-            elif zipfile.is_zipfile(archive_path):
-                with zipfile.ZipFile(archive_path, "r") as zip_ref:
-                    zip_ref.extractall(self.temp_dir)
-                    logging.info(f"Extracted zip file to {self.temp_dir}")
-            else:
-                logging.error("Unsupported file format")
-                raise ValueError("Unsupported file format")
-            if not self.code_dir.exists():
-                raise FileNotFoundError("code/ directory not found in archive")
+            self.artifact = artifact_cache.fetch(str(archive_path))
+            self._use_code_dir(self.artifact.path / "code")
         except Exception as e:
             logging.error(f"Error extracting archive: {e}")
             raise
 
+    def dependency_key(self):
+        """Requirements hash of the downloaded code, None without requirements.txt."""
+        if self.requirements_file.exists():
+            return requirements_hash(self.requirements_file)
+        return None
+
     def install_dependencies(self):
         try:
             if self.requirements_file.exists():
-                subprocess.check_call(
-                    [sys.executable, "-m", "pip", "install", "-r", str(self.requirements_file)])
-                logging.info("Installed dependencies from requirements.txt")
+                env_path = dependency_cache.ensure(self.requirements_file)
+                dependency_cache.activate(env_path)
+                logging.info(f"Using dependency layer {env_path.name}")
             else:
                 logging.warning("No requirements.txt found")
         except subprocess.CalledProcessError as e:
@@ -132,6 +107,33 @@ class LocalCodeExecutor:
             logging.error(f"Error during evaluation: {e}")
             raise
 
+    def evaluate_batch(self, inputs: list) -> list:
+        """Evaluates many inputs, through eval_batch when the policy defines one.
+
+        Without eval_batch every input is evaluated on its own and a failing
+        input gets an error entry in place of its output.
+        """
+        if not self.function_class:
+            raise RuntimeError("Function class not initialized")
+
+        eval_batch = getattr(self.function_class, "eval_batch", None)
+        if eval_batch is not None:
+            outputs = list(eval_batch(self.parameters, inputs, None))
+            if len(outputs) != len(inputs):
+                raise ValueError(
+                    f"eval_batch returned {len(outputs)} outputs for {len(inputs)} inputs")
+            return outputs
+
+        outputs = []
+        for input_data in inputs:
+            try:
+                outputs.append(self.function_class.eval(
+                    self.parameters, input_data, None))
+            except Exception as e:
+                logging.error(f"Error during evaluation: {e}")
+                outputs.append({"success": False, "message": str(e)})
+        return outputs
+
     def init(self):
         try:
             archive_path = self.download()
@@ -143,10 +145,8 @@ class LocalCodeExecutor:
 
     def execute(self, input_data):
         try:
-            archive_path = self.download()
-            self.unpack(archive_path)
-            self.install_dependencies()
-            self.initialize_function()
+            if not self.function_class:
+                self.init()
             return self.evaluate(input_data)
         except Exception as e:
             logging.error(f"Execution failed: {e}")
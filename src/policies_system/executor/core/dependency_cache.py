@@ -0,0 +1,123 @@
+import os
+import sys
+import uuid
+import shutil
+import hashlib
+import logging
+import platform
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from .artifact_cache import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+def requirements_hash(requirements_file: Path) -> str:
+    """Hash of the requirements and the interpreter they are installed for.
+
+    Comments, blank lines and ordering do not change the hash.
+    """
+    lines = []
+    with open(requirements_file) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                lines.append(line)
+    digest = hashlib.sha256()
+    digest.update(f"{sys.implementation.cache_tag}-{platform.machine()}\n".encode())
+    digest.update("\n".join(sorted(lines)).encode())
+    return digest.hexdigest()
+
+
+class DependencyCache:
+    """Prebuilt dependency layers, one per requirements hash, shared by all processes on the node.
+
+    envs/<hash>/ is built once with `pip install --target` into a staging
+    directory under an exclusive flock and renamed into place. Policies
+    with the same requirements then share it; activating a layer puts it
+    first on sys.path instead of installing into the executor's interpreter.
+
+    With DEPENDENCY_WHEELHOUSE set, layers are installed from that
+    directory with --no-index. Missing wheels are built into it first with
+    `pip wheel` unless DEPENDENCY_OFFLINE is true.
+
+    Within one process an already imported package is not re-imported from
+    another layer, so a worker activates a single layer and the worker pool
+    keeps policies of different layers apart.
+    """
+
+    def __init__(self, root: str, wheelhouse: Optional[str], offline: bool):
+        self.root = Path(root)
+        self.envs_dir = self.root / "envs"
+        self.locks_dir = self.root / "locks"
+        self.tmp_dir = self.root / "tmp"
+        self.wheelhouse = Path(wheelhouse) if wheelhouse else None
+        self.offline = offline
+        self._active: List[str] = []
+
+    def _pip(self, *args: str):
+        subprocess.check_call([
+            sys.executable, "-m", "pip", *args,
+            "--disable-pip-version-check", "--no-warn-script-location", "--quiet"])
+
+    def _install(self, requirements_file: Path, target: Path):
+        if self.wheelhouse is None:
+            self._pip("install", "--target", str(target),
+                      "-r", str(requirements_file))
+            return
+
+        self.wheelhouse.mkdir(parents=True, exist_ok=True)
+        offline_install = ("install", "--no-index", "--find-links", str(self.wheelhouse),
+                           "--target", str(target), "-r", str(requirements_file))
+        try:
+            self._pip(*offline_install)
+            return
+        except subprocess.CalledProcessError:
+            if self.offline:
+                raise
+            logger.info("Wheelhouse incomplete, building missing wheels")
+
+        shutil.rmtree(target, ignore_errors=True)
+        with file_lock(self.locks_dir / "wheelhouse.lock"):
+            self._pip("wheel", "--wheel-dir", str(self.wheelhouse),
+                      "-r", str(requirements_file))
+        self._pip(*offline_install)
+
+    def ensure(self, requirements_file: Path) -> Path:
+        """Returns the layer for the requirements file, building it on first use."""
+        key = requirements_hash(requirements_file)
+        env_path = self.envs_dir / key
+        if env_path.is_dir():
+            return env_path
+
+        for path in (self.envs_dir, self.locks_dir, self.tmp_dir):
+            path.mkdir(parents=True, exist_ok=True)
+
+        with file_lock(self.locks_dir / f"{key}.lock"):
+            if env_path.is_dir():
+                return env_path
+
+            staging = self.tmp_dir / f"env-{key}-{uuid.uuid4()}"
+            try:
+                logger.info(f"Building dependency layer {key}")
+                self._install(requirements_file, staging)
+                staging.mkdir(exist_ok=True)  # requirements without packages
+                os.rename(staging, env_path)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        return env_path
+
+    def activate(self, env_path: Path):
+        path = str(env_path)
+        if path in self._active:
+            return
+        sys.path.insert(0, path)
+        self._active.append(path)
+
+
+dependency_cache = DependencyCache(
+    root=os.getenv("DEPENDENCY_CACHE_DIR", "/tmp/policy-deps"),
+    wheelhouse=os.getenv("DEPENDENCY_WHEELHOUSE"),
+    offline=os.getenv("DEPENDENCY_OFFLINE", "false").lower() == "true")
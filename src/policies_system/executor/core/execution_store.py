@@ -0,0 +1,80 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .executor import ExecutionHandle
+
+
+class ExecutionStoreFull(Exception):
+    pass
+
+
+class ExecutionStore:
+    """Asynchronous executions of this API process, by execution id.
+
+    Finished executions are kept for `ttl` seconds after they complete. The
+    store holds at most `max_entries` executions; when full, the oldest
+    finished ones make room and a new execution is refused if all of them
+    are still running.
+
+    A slot is reserved before the execution is submitted, so a refused
+    execution never runs: reserve(), then add() the handle or
+    release_reservation() if the submission failed.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, ExecutionHandle]" = OrderedDict()
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        now = time.monotonic()
+        for execution_id, handle in list(self._entries.items()):
+            if handle.done() and now - handle.finished_at >= self.ttl:
+                self._drop(execution_id)
+
+    def _drop(self, execution_id: str):
+        handle = self._entries.pop(execution_id)
+        handle.get_payload().release()
+
+    def reserve(self):
+        """Claims a slot for an execution about to be submitted.
+
+        Raises ExecutionStoreFull when every slot is held by a running or
+        reserved execution.
+        """
+        with self._lock:
+            self._expire()
+            if len(self._entries) + self._reserved >= self.max_entries:
+                for execution_id, entry in list(self._entries.items()):
+                    if entry.done():
+                        self._drop(execution_id)
+                        break
+                else:
+                    raise ExecutionStoreFull(
+                        f"Too many running executions ({self.max_entries})")
+            self._reserved += 1
+
+    def release_reservation(self):
+        with self._lock:
+            self._reserved -= 1
+
+    def add(self, handle: ExecutionHandle):
+        """Stores the handle in the slot claimed by reserve()."""
+        with self._lock:
+            self._reserved -= 1
+            self._entries[handle.task_id] = handle
+
+    def get(self, execution_id: str) -> Optional[ExecutionHandle]:
+        with self._lock:
+            self._expire()
+            return self._entries.get(execution_id)
+
+
+execution_store = ExecutionStore(
+    max_entries=int(os.getenv("EXECUTION_STORE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("EXECUTION_RESULT_TTL", "600")))
@@ -1,94 +1,326 @@
-from multiprocessing import Process, Queue, Semaphore
+import multiprocessing
 import os
-from .db import PolicyDB
-from .code_executor import LocalCodeExecutor
+import time
+import uuid
+import threading
+import itertools
+from collections import deque
+from .result_transport import ResultPayload
+from .worker import worker_main
 import logging
-from multiprocessing import Process, Queue, Semaphore
-import os
-import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 
-class PolicyFunctionExecutor:
-    def __init__(self):
-        self.policy_db = PolicyDB()
+class ExecutionHandle:
+    """Result of a policy execution submitted to the worker pool.
 
-    def execute(self, policy_rule_uri: str, parameters: dict = None, input_data: dict = None):
+    get() returns the decoded output, get_payload() the JSON encoded bytes
+    as the worker produced them, for writing straight into a response.
+    """
 
-        if not input_data:
-            raise ValueError("input_data is mandatory and cannot be None.")
+    _UNSET = object()
 
-        logging.info(f"Fetching policy data for URI: {policy_rule_uri}")
-        policy_data = self.policy_db.read(policy_rule_uri)
-        if not policy_data:
-            raise ValueError(
-                f"Policy rule with URI '{policy_rule_uri}' not found.")
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self._event = threading.Event()
+        self._payload: Optional[ResultPayload] = None
+        self._value = self._UNSET
+        self.finished_at: Optional[float] = None
 
-        logging.info("Determining parameters for execution")
-        policy_parameters = policy_data.policy_parameters
-        if parameters is None:
-            parameters = policy_parameters
+    def set(self, payload: ResultPayload):
+        self._payload = payload
+        self.finished_at = time.monotonic()
+        self._event.set()
 
-        logging.info(
-            f"Initializing LocalCodeExecutor for policy {policy_rule_uri}")
-        try:
-            executor = LocalCodeExecutor(
-                download_url=policy_data.code,
-                settings=policy_data.policy_settings,
-                parameters=parameters,
-            )
-            results = executor.execute(input_data)
-            logging.info(
-                f"Execution completed successfully for policy {policy_rule_uri}")
-            return results
-        except Exception as e:
-            logging.error(
-                f"Failed to execute policy function for URI '{policy_rule_uri}': {e}")
-            raise
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def get_payload(self, timeout: Optional[float] = None) -> ResultPayload:
+        if not self.wait(timeout):
+            raise TimeoutError(
+                f"Policy execution {self.task_id} did not finish in {timeout}s")
+        return self._payload
+
+    def get(self, timeout: Optional[float] = None):
+        payload = self.get_payload(timeout)
+        if self._value is self._UNSET:
+            self._value = payload.value()
+        return self._value
 
 
 logging.basicConfig(level=logging.INFO)
 
 
 class MultiprocessingPolicyRuleExecutor:
+    """Runs policies in a pool of long-lived worker processes.
+
+    The pool has MAX_PROCESSES workers. With MAX_PROCESSES unset or 0,
+    concurrency stays unlimited: as many workers as CPUs are kept warm and
+    another one is started whenever a task finds them all busy; workers
+    beyond the CPU count exit after WORKER_IDLE_TIMEOUT idle seconds.
+    Workers keep policies loaded between calls and are replaced after
+    WORKER_MAX_TASKS tasks, when their memory goes above
+    WORKER_MAX_MEMORY_MB, or when they die, in which case the task assigned
+    to them fails.
+
+    Each worker has its own task queue and is handed one task at a time when
+    it reports ready, so the pool always knows which task a worker holds.
+
+    A worker runs policies of one dependency layer only (see
+    WarmPolicyRunner). It hands back a task whose policy needs another
+    layer; the pool remembers that policy's layer, queues the task again
+    and from then on only gives it to workers with the same or no layer,
+    retiring an idle worker for a fresh one when no live worker can run it.
+    """
+
     def __init__(self):
 
         max_processes = int(os.getenv("MAX_PROCESSES", "0"))
-        self.semaphore = Semaphore(
-            max_processes) if max_processes > 0 else None
-        self.processes = {}  # Track running processes
+        self.pool_size = max_processes if max_processes > 0 else (os.cpu_count() or 1)
+        self.elastic = max_processes <= 0
+        self.idle_timeout = float(os.getenv("WORKER_IDLE_TIMEOUT", "60"))
+        self.max_tasks = int(os.getenv("WORKER_MAX_TASKS", "1000"))
+        self.max_memory_mb = int(os.getenv("WORKER_MAX_MEMORY_MB", "0"))
+        self.max_instances = int(os.getenv("WORKER_MAX_POLICY_INSTANCES", "16"))
+        self.policy_ttl = float(os.getenv("WORKER_POLICY_TTL", "10"))
+        self.monitor_interval = float(os.getenv("WORKER_MONITOR_INTERVAL", "1"))
+        self.batch_min_chunk_size = int(os.getenv("BATCH_MIN_CHUNK_SIZE", "16"))
+
+        # spawn, the API process already runs threads when the pool starts
+        self._ctx = multiprocessing.get_context(
+            os.getenv("WORKER_START_METHOD", "spawn"))
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._started = False
+        self._stopping = False
+        self._worker_ids = itertools.count()
+        self.processes = {}  # Track worker processes by worker id
+        self._task_queues = {}
+        self._pending: Dict[str, ExecutionHandle] = {}
+        self._backlog: deque = deque()
+        self._idle: deque = deque()
+        self._idle_since: Dict[int, float] = {}
+        self._starting = set()
+        self._retiring = set()
+        self._running: Dict[int, tuple] = {}
+        self._worker_layers: Dict[int, Optional[str]] = {}
+        self._policy_layers: Dict[str, str] = {}
+        self._dead_since: Dict[int, float] = {}
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            # written synchronously, a result is not lost when its worker
+            # exits right after sending it
+            self._results = self._ctx.SimpleQueue()
+            for _ in range(self.pool_size):
+                self._spawn_worker()
+            threading.Thread(target=self._collect, daemon=True).start()
+            threading.Thread(target=self._monitor, daemon=True).start()
+            self._started = True
+
+    def _spawn_worker(self):
+        worker_id = next(self._worker_ids)
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(worker_id, tasks, self._results, self.max_tasks,
+                  self.max_memory_mb, self.max_instances, self.policy_ttl),
+            daemon=True,
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self._task_queues[worker_id] = tasks
+        self._starting.add(worker_id)
+        logging.info(f"Started worker process {process.pid}")
 
-    def _execute_in_process(self, policy_rule_uri, parameters, input_data, result_queue):
+    def _remove_worker(self, worker_id: int):
+        process = self.processes.pop(worker_id, None)
+        tasks = self._task_queues.pop(worker_id, None)
+        if tasks is not None:
+            tasks.cancel_join_thread()
+            tasks.close()
+        if worker_id in self._idle:
+            self._idle.remove(worker_id)
+        self._idle_since.pop(worker_id, None)
+        self._starting.discard(worker_id)
+        self._retiring.discard(worker_id)
+        self._worker_layers.pop(worker_id, None)
+        return process
 
-        try:
-            executor = PolicyFunctionExecutor()
-            result = executor.execute(policy_rule_uri, parameters, input_data)
-            result_queue.put(result)
-        except Exception as e:
-            logging.error(f"Error in subprocess execution: {e}")
-            result_queue.put({"success": False, "message": str(e)})
-        finally:
-            if self.semaphore:
-                self.semaphore.release()
+    def _grow(self):
+        """Spawns workers up to pool_size, and beyond it for queued tasks when elastic."""
+        if self._stopping:
+            return
+        while len(self.processes) < self.pool_size or (
+                self.elastic and len(self._backlog) > len(self._starting)):
+            self._spawn_worker()
 
-    def execute(self, policy_rule_uri: str, parameters: Dict[str, Any] = None, input_data: Dict[str, Any] = None) -> Queue:
+    def _retire(self, worker_id: int):
+        self._idle.remove(worker_id)
+        self._retiring.add(worker_id)
+        self._task_queues[worker_id].put(None)
+
+    def _retire_idle_workers(self):
+        now = time.monotonic()
+        for worker_id in list(self._idle):
+            if len(self.processes) - len(self._retiring) <= self.pool_size:
+                return
+            if now - self._idle_since[worker_id] >= self.idle_timeout:
+                self._retire(worker_id)
+
+    def _can_run(self, worker_id: int, task: tuple) -> bool:
+        layer = self._worker_layers.get(worker_id)
+        required = self._policy_layers.get(task[1])
+        return layer is None or required is None or layer == required
+
+    def _assign(self, worker_id: int) -> bool:
+        """Hands the first queued task the worker can run to it."""
+        for task in self._backlog:
+            if self._can_run(worker_id, task):
+                self._backlog.remove(task)
+                # recorded before sending, a worker that dies holding the task fails it
+                self._running[worker_id] = task
+                self._task_queues[worker_id].put(task)
+                return True
+        return False
+
+    def _dispatch(self):
+        """Hands queued tasks to idle workers that can run them."""
+        for worker_id in list(self._idle):
+            if not self._backlog:
+                return
+            if self._assign(worker_id):
+                self._idle.remove(worker_id)
+
+        if self._backlog and self._idle and not self._retiring and not any(
+                self._can_run(worker_id, self._backlog[0])
+                for worker_id in self.processes if worker_id not in self._retiring):
+            # every worker is bound to another dependency layer
+            self._retire(self._idle[0])
+
+    def _finish(self, task_id: str, payload: ResultPayload):
+        handle = self._pending.pop(task_id, None)
+        if handle:
+            handle.set(payload)
+        else:
+            payload.release()
+
+    def _collect(self):
+        while True:
+            try:
+                kind, worker_id, task_id, payload = self._results.get()
+                with self._state_lock:
+                    if kind == "ready":
+                        self._starting.discard(worker_id)
+                        if worker_id in self.processes and worker_id not in self._retiring:
+                            self._worker_layers[worker_id] = payload
+                            self._idle.append(worker_id)
+                            self._idle_since[worker_id] = time.monotonic()
+                            self._dispatch()
+                    elif kind == "result":
+                        self._running.pop(worker_id, None)
+                        self._finish(task_id, ResultPayload.from_message(payload))
+                    elif kind == "conflict":
+                        task = self._running.pop(worker_id, None)
+                        if task:
+                            self._policy_layers[task[1]] = payload
+                            self._backlog.appendleft(task)
+                            self._grow()
+                    elif kind == "exit":
+                        process = self._remove_worker(worker_id)
+                        if process is not None:
+                            process.join()
+                            self._grow()
+            except Exception as e:
+                logging.error(f"Error collecting worker results: {e}")
+
+    def _monitor(self):
+        while True:
+            time.sleep(self.monitor_interval)
+            try:
+                with self._state_lock:
+                    self._reap_dead_workers()
+                    if self.elastic:
+                        self._retire_idle_workers()
+            except Exception as e:
+                logging.error(f"Error monitoring worker processes: {e}")
+
+    def _reap_dead_workers(self):
+        # a worker is only given up one interval after it was seen dead, so
+        # the messages it sent before exiting are consumed first
+        now = time.monotonic()
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            dead_since = self._dead_since.setdefault(worker_id, now)
+            if now - dead_since < self.monitor_interval:
+                continue
+
+            self._dead_since.pop(worker_id, None)
+            self._remove_worker(worker_id)
+            logging.error(
+                f"Worker process {process.pid} died with exit code {process.exitcode}")
+            task = self._running.pop(worker_id, None)
+            if task:
+                self._finish(task[0], ResultPayload.from_value({
+                    "success": False,
+                    "message": f"Worker process exited with code {process.exitcode}"}))
+            self._grow()
+
+    def execute(self, policy_rule_uri: str, parameters: Dict[str, Any] = None, input_data: Dict[str, Any] = None) -> ExecutionHandle:
 
         if not input_data:
             raise ValueError("input_data is mandatory and cannot be None.")
 
-        if self.semaphore:
-            self.semaphore.acquire()
+        return self._submit(policy_rule_uri, parameters, input_data, False)
 
-        result_queue = Queue()
+    def execute_batch(self, policy_rule_uri: str, parameters: Dict[str, Any] = None,
+                      inputs: List[Dict[str, Any]] = None) -> List[Tuple[ExecutionHandle, int]]:
+        """Splits the inputs into chunks spread over the workers.
 
-        process = Process(
-            target=self._execute_in_process,
-            args=(policy_rule_uri, parameters, input_data, result_queue)
-        )
-        process.start()
+        Returns one (handle, input count) per chunk, in input order; a chunk
+        resolves to the list of its outputs, or to an error entry when the
+        whole chunk failed.
+        """
 
-        self.processes[process.pid] = (process, result_queue)
+        if not inputs or not isinstance(inputs, list):
+            raise ValueError("inputs must be a non-empty list.")
+
+        chunk_size = max(self.batch_min_chunk_size,
+                         -(-len(inputs) // self.pool_size))
+        return [
+            (self._submit(policy_rule_uri, parameters,
+                          inputs[start:start + chunk_size], True),
+             len(inputs[start:start + chunk_size]))
+            for start in range(0, len(inputs), chunk_size)
+        ]
+
+    def _submit(self, policy_rule_uri: str, parameters, input_data, batch: bool) -> ExecutionHandle:
+        self._ensure_started()
+
+        handle = ExecutionHandle(str(uuid.uuid4()))
+        with self._state_lock:
+            self._pending[handle.task_id] = handle
+            self._backlog.append((handle.task_id, policy_rule_uri,
+                                  parameters, input_data, batch))
+            self._dispatch()
+            self._grow()
 
         logging.info(
-            f"Started process {process.pid} for policy {policy_rule_uri}")
-        return result_queue
+            f"Queued task {handle.task_id} for policy {policy_rule_uri}")
+        return handle
+
+    def shutdown(self):
+        if not self._started:
+            return
+        with self._state_lock:
+            self._stopping = True
+            for tasks in self._task_queues.values():
+                tasks.put(None)
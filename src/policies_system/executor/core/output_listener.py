@@ -1,3 +1,4 @@
+import os
 import redis
 import json
 import logging
@@ -13,6 +14,10 @@ class OutputListener:
             self.redis_client = redis.StrictRedis(
                 host=redis_host, port=redis_port, decode_responses=True)
             self.redis_queue = redis_queue
+            self.events_channel = os.getenv("JOB_EVENTS_CHANNEL", "JOB_EVENTS")
+            events_url = os.getenv("JOB_EVENTS_REDIS_URL")
+            self.events_client = redis.StrictRedis.from_url(
+                events_url) if events_url else self.redis_client
             self.db = PolicyJobsDB()
             logging.basicConfig(level=logging.INFO)
         except Exception as e:
@@ -27,7 +32,8 @@ class OutputListener:
             node_id = message.get("node_id")
             job_policy_rule_uri = message.get("job_policy_rule_uri")
 
-            if not all([job_id, job_output_data, job_status, node_id, job_policy_rule_uri]):
+            # node_id is empty for jobs that report it, so only presence is checked
+            if not all([job_id, job_status, job_policy_rule_uri]) or job_output_data is None or node_id is None:
                 logging.warning(f"Invalid message received: {message}")
                 return
 
@@ -40,6 +46,8 @@ class OutputListener:
                 existing_job.job_policy_rule_uri = job_policy_rule_uri
                 updated = self.db.update(job_id, existing_job)
                 logging.info(f"Job '{job_id}' updated: {updated}")
+                if updated:
+                    self._publish(existing_job)
             else:
                 # Create new job entry
                 new_job = PolicyJobs(
@@ -51,10 +59,20 @@ class OutputListener:
                 )
                 created = self.db.create(new_job)
                 logging.info(f"Job '{job_id}' created: {created}")
+                if created:
+                    self._publish(new_job)
 
         except Exception as e:
             logging.error(f"Error processing message: {e}")
 
+    def _publish(self, job: PolicyJobs):
+        # lets the system API wake up clients waiting on this job instead of polling
+        try:
+            self.events_client.publish(
+                self.events_channel, json.dumps(job.to_dict()))
+        except Exception as e:
+            logging.error(f"Failed to publish job event for '{job.job_id}': {e}")
+
     def listen(self):
         try:
             logging.info("Listening for job outputs...")
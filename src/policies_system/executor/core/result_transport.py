@@ -0,0 +1,124 @@
+import os
+import json
+import logging
+from multiprocessing import shared_memory, resource_tracker
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# outputs at least this large go through shared memory, smaller ones inline
+SHM_MIN_BYTES = int(os.getenv("RESULT_SHM_MIN_BYTES", str(64 * 1024)))
+CHUNK_SIZE = int(os.getenv("RESULT_CHUNK_SIZE", str(1024 * 1024)))
+
+
+def encode_result(output) -> tuple:
+    """Called in the worker: serializes the output once, as the JSON the API returns.
+
+    Returns the message sent to the parent, ("inline", bytes) or
+    ("shm", block name, size).
+    """
+    data = json.dumps(output, separators=(",", ":"), default=str).encode()
+    if len(data) < SHM_MIN_BYTES:
+        return ("inline", data)
+
+    block = shared_memory.SharedMemory(create=True, size=len(data))
+    block.buf[:len(data)] = data
+    # the parent owns the block from here on, without this the worker's
+    # resource tracker would unlink it when the worker exits
+    resource_tracker.unregister(block._name, "shared_memory")
+    block.close()
+    return ("shm", block.name, len(data))
+
+
+class ResultPayload:
+    """JSON encoded output of a policy execution, held inline or in a shared memory block.
+
+    The block is unlinked once the payload is released, consumed with
+    iter_chunks() or garbage collected.
+    """
+
+    def __init__(self, data: bytes = None, block: Optional[shared_memory.SharedMemory] = None,
+                 size: int = 0):
+        self._data = data
+        self._block = block
+        self.size = len(data) if data is not None else size
+
+    @staticmethod
+    def from_message(message: tuple) -> 'ResultPayload':
+        if message[0] == "inline":
+            return ResultPayload(data=message[1])
+        _, name, size = message
+        return ResultPayload(block=shared_memory.SharedMemory(name=name), size=size)
+
+    @staticmethod
+    def from_value(value) -> 'ResultPayload':
+        return ResultPayload(data=json.dumps(value, separators=(",", ":"), default=str).encode())
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            if self._data is not None:
+                yield self._data
+                return
+            for offset in range(0, self.size, chunk_size):
+                yield bytes(self._block.buf[offset:min(offset + chunk_size, self.size)])
+        finally:
+            self.release()
+
+    def to_bytes(self) -> bytes:
+        if self._data is None and self._block is not None:
+            self._data = bytes(self._block.buf[:self.size])
+            self.release()
+        return self._data
+
+    def value(self):
+        return json.loads(self.to_bytes())
+
+    def release(self):
+        block, self._block = self._block, None
+        if block is None:
+            return
+        try:
+            block.close()
+            block.unlink()
+        except (FileNotFoundError, BufferError) as e:
+            logger.warning(f"Could not release result block {block.name}: {e}")
+
+    def __del__(self):
+        self.release()
+
+
+def _batch_items(payload: ResultPayload, count: int) -> Iterator[bytes]:
+    """Chunks of a batch chunk's JSON array, without the brackets."""
+    chunks = payload.iter_chunks()
+    first = next(chunks)
+    if not first.startswith(b"["):
+        # the whole chunk failed, each of its inputs gets the error entry
+        error = b"".join([first, *chunks])
+        yield b",".join([error] * count)
+        return
+
+    previous = first[1:]
+    for chunk in chunks:
+        yield previous
+        previous = chunk
+    yield previous[:-1]
+
+
+def batch_envelope(chunks: Iterable[tuple]) -> Iterator[bytes]:
+    """Response body of a batch execution from its (handle, input count) chunks, in order.
+
+    Every chunk is read whole before it is written, a chunk that cannot be
+    read gets an error entry per input so the JSON is always complete.
+    """
+    yield b'{"success": true, "data": ['
+    for index, (handle, count) in enumerate(chunks):
+        if index:
+            yield b','
+        try:
+            items = b"".join(_batch_items(handle.get_payload(), count))
+        except Exception as e:
+            logger.error(f"Error reading batch chunk {handle.task_id}: {e}")
+            error = json.dumps({"success": False, "message": str(e)}).encode()
+            items = b",".join([error] * count)
+        yield items
+    yield b']}'
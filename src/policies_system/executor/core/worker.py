@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import resource
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .db import PolicyDB, PolicyRule
+from .code_executor import LocalCodeExecutor
+from .result_transport import encode_result
+
+# Entry point of the policy worker processes. Kept apart from the API
+# modules so a spawned worker only imports what it runs policies with.
+
+
+class DependencyConflict(Exception):
+    """The policy needs another dependency layer than the one the worker has active."""
+
+    def __init__(self, layer: str):
+        super().__init__(f"Policy needs dependency layer {layer}")
+        self.layer = layer
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def policy_version_hash(policy: PolicyRule) -> str:
+    """Changes whenever anything that goes into a loaded policy instance changes."""
+    return _digest([policy.code, policy.version, policy.release_tag, policy.policy_settings])
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # peak rather than current usage, still good enough to trigger a recycle
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class WarmPolicyRunner:
+    """Loaded policy instances of one worker process.
+
+    Instances are keyed by policy_rule_uri, policy version hash and parameters
+    hash, so a repeated execution only costs the eval call. Policy documents
+    are re-read after `policy_ttl` seconds to pick up new versions.
+
+    Imported packages cannot be swapped within a process, so the runner
+    binds to the dependency layer of the first policy with requirements it
+    loads (`layer`) and refuses policies that need another one with
+    DependencyConflict.
+    """
+
+    def __init__(self, max_instances: int, policy_ttl: float):
+        self.policy_db = PolicyDB()
+        self.max_instances = max_instances
+        self.policy_ttl = policy_ttl
+        self.instances: "OrderedDict[tuple, LocalCodeExecutor]" = OrderedDict()
+        self.policies: Dict[str, tuple] = {}
+        self.layer: Optional[str] = None
+
+    def _read_policy(self, policy_rule_uri: str) -> PolicyRule:
+        entry = self.policies.get(policy_rule_uri)
+        if entry and time.monotonic() - entry[1] < self.policy_ttl:
+            return entry[0]
+
+        logging.info(f"Fetching policy data for URI: {policy_rule_uri}")
+        policy_data = self.policy_db.read(policy_rule_uri)
+        if not policy_data:
+            raise ValueError(
+                f"Policy rule with URI '{policy_rule_uri}' not found.")
+        self.policies[policy_rule_uri] = (policy_data, time.monotonic())
+        return policy_data
+
+    def _instance(self, policy_rule_uri: str, parameters: Optional[dict]) -> LocalCodeExecutor:
+        policy_data = self._read_policy(policy_rule_uri)
+        if parameters is None:
+            parameters = policy_data.policy_parameters
+
+        key = (policy_rule_uri, policy_version_hash(policy_data), _digest(parameters))
+        executor = self.instances.get(key)
+        if executor is None:
+            logging.info(
+                f"Loading policy {policy_rule_uri} in worker {os.getpid()}")
+            executor = LocalCodeExecutor(
+                download_url=policy_data.code,
+                settings=policy_data.policy_settings,
+                parameters=parameters,
+            )
+            executor.unpack(executor.download())
+            layer = executor.dependency_key()
+            if layer and self.layer and layer != self.layer:
+                raise DependencyConflict(layer)
+            executor.install_dependencies()
+            executor.initialize_function()
+            self.layer = self.layer or layer
+            self.instances[key] = executor
+            while len(self.instances) > self.max_instances:
+                self.instances.popitem(last=False)
+        else:
+            self.instances.move_to_end(key)
+        return executor
+
+    def execute(self, policy_rule_uri: str, parameters: dict = None, input_data: dict = None):
+
+        if not input_data:
+            raise ValueError("input_data is mandatory and cannot be None.")
+
+        return self._instance(policy_rule_uri, parameters).evaluate(input_data)
+
+    def execute_batch(self, policy_rule_uri: str, parameters: dict = None, inputs: list = None):
+        return self._instance(policy_rule_uri, parameters).evaluate_batch(inputs)
+
+
+def worker_main(worker_id: int, tasks, results, max_tasks: int, max_memory_mb: int,
+                 max_instances: int, policy_ttl: float):
+    logging.basicConfig(level=logging.INFO)
+    runner = WarmPolicyRunner(max_instances, policy_ttl)
+    completed = 0
+
+    while True:
+        results.put(("ready", worker_id, None, runner.layer))
+        task = tasks.get()
+        if task is None:
+            break
+
+        task_id, policy_rule_uri, parameters, input_data, batch = task
+        try:
+            if batch:
+                output = runner.execute_batch(
+                    policy_rule_uri, parameters, input_data)
+            else:
+                output = runner.execute(
+                    policy_rule_uri, parameters, input_data)
+        except DependencyConflict as e:
+            # handed back to the pool, which runs it on a worker with that layer
+            results.put(("conflict", worker_id, task_id, e.layer))
+            continue
+        except Exception as e:
+            logging.error(f"Error in worker execution: {e}")
+            output = {"success": False, "message": str(e)}
+        try:
+            message = encode_result(output)
+        except Exception as e:
+            logging.error(f"Error encoding policy output: {e}")
+            message = encode_result({"success": False, "message": str(e)})
+        results.put(("result", worker_id, task_id, message))
+
+        completed += 1
+        if max_tasks and completed >= max_tasks:
+            logging.info(f"Worker {os.getpid()} recycling after {completed} tasks")
+            break
+        if max_memory_mb and _rss_mb() > max_memory_mb:
+            logging.info(f"Worker {os.getpid()} recycling at {_rss_mb():.0f} MB")
+            break
+
+    results.put(("exit", worker_id, None, None))
@@ -1,4 +1,6 @@
-from core.api import run_app
-
 if __name__ == "__main__":
+    # imported here, spawned policy workers re-import this module as
+    # __mp_main__ and must not load the API
+    from core.api import run_app
+
     run_app()
@@ -0,0 +1,149 @@
+import io
+import multiprocessing
+import os
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.artifact_cache import ArtifactCache
+
+
+def make_archive(path, content: str, size: int = 0):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in (("code/policy.py", content.encode()),
+                           ("code/blob.bin", os.urandom(size))):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(root=str(tmp_path / "cache"), max_bytes=0)
+
+
+def test_local_archive_is_extracted_once(cache, tmp_path):
+    archive = make_archive(tmp_path / "policy.tar.gz", "v1")
+
+    first = cache.fetch(str(archive))
+    assert (first.path / "code" / "policy.py").read_text() == "v1"
+
+    second = cache.fetch(str(archive))
+    assert second.path == first.path
+    assert len(list(cache.objects_dir.iterdir())) == 1
+
+
+def test_archive_without_code_directory_is_rejected(cache, tmp_path):
+    archive = tmp_path / "empty.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        info = tarfile.TarInfo("readme")
+        tar.addfile(info, io.BytesIO(b""))
+
+    with pytest.raises(FileNotFoundError):
+        cache.fetch(str(archive))
+    assert list(cache.objects_dir.iterdir()) == []
+    assert list(cache.tmp_dir.iterdir()) == []
+
+
+def _fetch_in_child(cache, location, results):
+    lease = cache.fetch(location)
+    results.put(str(lease.path))
+
+
+def test_concurrent_processes_share_one_extraction(cache, tmp_path):
+    archive = make_archive(tmp_path / "policy.tar.gz", "v1", size=1024 * 1024)
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.SimpleQueue()
+    processes = [ctx.Process(target=_fetch_in_child, args=(cache, str(archive), results))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    assert len({results.get() for _ in processes}) == 1
+    assert len(list(cache.objects_dir.iterdir())) == 1
+    assert list(cache.tmp_dir.iterdir()) == []
+
+
+def test_eviction_skips_leased_entries(tmp_path):
+    cache = ArtifactCache(root=str(tmp_path / "cache"), max_bytes=150 * 1024)
+    archives = [make_archive(tmp_path / f"policy-{index}.tar.gz", str(index), size=100 * 1024)
+                for index in range(3)]
+
+    oldest = cache.fetch(str(archives[0]))
+    released = cache.fetch(str(archives[1]))
+    released.release()
+    newest = cache.fetch(str(archives[2]))
+
+    # over budget: the oldest entry is leased, so the released one goes
+    assert oldest.path.is_dir()
+    assert not released.path.exists()
+    assert newest.path.is_dir()
+
+    oldest.release()
+    cache.evict()
+    assert not oldest.path.exists()
+    assert newest.path.is_dir()
+
+
+class ArchiveServer:
+    """Serves one archive with an ETag, answering If-None-Match with 304."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.etag = '"v1"'
+        self.downloads = 0
+        self.not_modified = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.headers.get("If-None-Match") == server.etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                server.downloads += 1
+                self.send_response(200)
+                self.send_header("ETag", server.etag)
+                self.send_header("Content-Length", str(len(server.data)))
+                self.end_headers()
+                self.wfile.write(server.data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/policy.tar.gz"
+
+
+@pytest.fixture
+def archive_server(tmp_path):
+    server = ArchiveServer(make_archive(tmp_path / "remote.tar.gz", "remote").read_bytes())
+    yield server
+    server.httpd.shutdown()
+
+
+def test_remote_archive_is_revalidated_with_etag(cache, archive_server):
+    first = cache.fetch(archive_server.url)
+    second = cache.fetch(archive_server.url)
+
+    assert second.path == first.path
+    assert (archive_server.downloads, archive_server.not_modified) == (1, 1)
+
+
+def test_evicted_remote_archive_is_downloaded_again(tmp_path, archive_server):
+    cache = ArtifactCache(root=str(tmp_path / "cache"), max_bytes=1)
+    cache.fetch(archive_server.url).release()
+    cache.evict()
+    assert list(cache.objects_dir.iterdir()) == []
+
+    lease = cache.fetch(archive_server.url)
+    assert (lease.path / "code" / "policy.py").read_text() == "remote"
+    assert (archive_server.downloads, archive_server.not_modified) == (2, 1)
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from core.execution_store import ExecutionStore, ExecutionStoreFull
+from core.executor import ExecutionHandle
+from core.result_transport import ResultPayload
+
+
+class TrackedPayload(ResultPayload):
+    def __init__(self):
+        super().__init__(data=b"{}")
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+def running(task_id):
+    return ExecutionHandle(task_id)
+
+
+def finished(task_id):
+    handle = ExecutionHandle(task_id)
+    handle.set(TrackedPayload())
+    return handle
+
+
+def store_with(store, handle):
+    store.reserve()
+    store.add(handle)
+    return handle
+
+
+def test_reservations_count_against_capacity():
+    store = ExecutionStore(max_entries=2, ttl=60)
+    store.reserve()
+    store.reserve()
+    with pytest.raises(ExecutionStoreFull):
+        store.reserve()
+
+    store.release_reservation()
+    store.reserve()
+
+
+def test_add_takes_over_the_reservation():
+    store = ExecutionStore(max_entries=2, ttl=60)
+    handle = store_with(store, running("a"))
+    assert store.get("a") is handle
+
+    store.reserve()
+    with pytest.raises(ExecutionStoreFull):
+        store.reserve()
+
+
+def test_running_executions_are_never_evicted():
+    store = ExecutionStore(max_entries=2, ttl=60)
+    store_with(store, running("a"))
+    store_with(store, running("b"))
+
+    with pytest.raises(ExecutionStoreFull):
+        store.reserve()
+    assert store.get("a") is not None and store.get("b") is not None
+
+
+def test_oldest_finished_execution_makes_room():
+    store = ExecutionStore(max_entries=2, ttl=60)
+    store_with(store, running("a"))
+    oldest = store_with(store, finished("b"))
+
+    store.reserve()
+    assert store.get("b") is None
+    assert oldest.get_payload().released
+    assert store.get("a") is not None
+
+
+def test_finished_executions_expire_after_ttl():
+    store = ExecutionStore(max_entries=4, ttl=0.05)
+    handle = store_with(store, finished("a"))
+    store_with(store, running("b"))
+    assert store.get("a") is handle
+
+    time.sleep(0.1)
+    assert store.get("a") is None
+    assert handle.get_payload().released
+    # running executions do not expire
+    assert store.get("b") is not None
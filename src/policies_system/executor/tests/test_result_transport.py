@@ -0,0 +1,101 @@
+import json
+from multiprocessing import shared_memory
+
+import pytest
+
+from core.executor import ExecutionHandle
+from core.result_transport import (SHM_MIN_BYTES, ResultPayload, batch_envelope,
+                                   encode_result)
+
+LARGE = {"items": ["x" * 1024] * (SHM_MIN_BYTES // 1024 + 1)}
+
+
+def resolved(output, task_id="chunk"):
+    handle = ExecutionHandle(task_id)
+    handle.set(ResultPayload.from_value(output))
+    return handle
+
+
+def assert_unlinked(name):
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_small_result_is_sent_inline():
+    message = encode_result({"a": [1, 2]})
+    assert message == ("inline", b'{"a":[1,2]}')
+
+    payload = ResultPayload.from_message(message)
+    assert payload.size == len(message[1])
+    assert payload.value() == {"a": [1, 2]}
+
+
+def test_large_result_round_trips_through_shared_memory():
+    message = encode_result(LARGE)
+    kind, name, size = message
+    assert kind == "shm" and size >= SHM_MIN_BYTES
+
+    payload = ResultPayload.from_message(message)
+    assert payload.value() == LARGE
+    # read once, the block is gone and the bytes are kept
+    assert_unlinked(name)
+    assert payload.value() == LARGE
+
+
+def test_streamed_result_is_unlinked_after_the_last_chunk():
+    kind, name, size = encode_result(LARGE)
+    payload = ResultPayload.from_message((kind, name, size))
+
+    chunks = list(payload.iter_chunks(chunk_size=4096))
+    assert len(chunks) == -(-size // 4096)
+    assert json.loads(b"".join(chunks)) == LARGE
+    assert_unlinked(name)
+
+
+def test_released_result_is_unlinked():
+    kind, name, size = encode_result(LARGE)
+    payload = ResultPayload.from_message((kind, name, size))
+    payload.release()
+    assert_unlinked(name)
+    # releasing twice is harmless
+    payload.release()
+
+
+def test_unconsumed_result_is_unlinked_when_collected():
+    kind, name, size = encode_result(LARGE)
+    ResultPayload.from_message((kind, name, size))
+    assert_unlinked(name)
+
+
+def envelope(chunks):
+    return json.loads(b"".join(batch_envelope(chunks)))
+
+
+def test_batch_envelope_joins_chunks_in_order():
+    body = envelope([(resolved([1, 2]), 2), (resolved([{"a": 3}]), 1)])
+    assert body == {"success": True, "data": [1, 2, {"a": 3}]}
+
+
+def test_batch_envelope_repeats_a_failed_chunk_per_input():
+    error = {"success": False, "message": "boom"}
+    body = envelope([(resolved(error), 2), (resolved([3]), 1)])
+    assert body["data"] == [error, error, 3]
+
+
+def test_batch_envelope_closes_when_a_chunk_cannot_be_read():
+    unreadable = ExecutionHandle("lost")
+    # a shared memory block that is already gone
+    unreadable.set(ResultPayload(block=None, size=16))
+
+    body = envelope([(resolved([1]), 1), (unreadable, 2), (resolved([4]), 1)])
+    assert body["data"][0] == 1 and body["data"][3] == 4
+    assert [item["success"] for item in body["data"][1:3]] == [False, False]
+
+
+def test_batch_envelope_reads_chunks_from_shared_memory():
+    items = [LARGE, {"b": 2}]
+    handle = ExecutionHandle("large")
+    handle.set(ResultPayload.from_message(encode_result(items)))
+
+    body = envelope([(handle, 2), (resolved([3]), 1)])
+    assert body["data"] == [LARGE, {"b": 2}, 3]
@@ -0,0 +1,101 @@
+import json
+import math
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class LatencyDistribution:
+    """Samples the service time of a fake executor.
+
+    Specs are `<kind>:<param>=<value>,...` with times in milliseconds:
+
+        constant:ms=20
+        uniform:low=5,high=50
+        normal:mean=20,stddev=5
+        lognormal:median=20,sigma=0.5
+        exponential:mean=20
+    """
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        self.spec = spec
+        self.kind = kind
+        self.params = {
+            key: float(value)
+            for key, value in (item.split("=") for item in params.split(",") if item)
+        }
+        if kind not in ("constant", "uniform", "normal", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "constant":
+            ms = p.get("ms", 0.0)
+        elif self.kind == "uniform":
+            ms = random.uniform(p.get("low", 0.0), p.get("high", 0.0))
+        elif self.kind == "normal":
+            ms = random.gauss(p.get("mean", 0.0), p.get("stddev", 0.0))
+        elif self.kind == "lognormal":
+            ms = random.lognormvariate(
+                math.log(p.get("median", 1.0)), p.get("sigma", 0.0))
+        else:
+            ms = random.expovariate(1.0 / p["mean"]) if p.get("mean") else 0.0
+        return max(ms, 0.0) / 1000
+
+
+class FakeExecutorHandler(BaseHTTPRequestHandler):
+    """Answers the executor endpoints the control plane calls, after a sampled delay."""
+
+    protocol_version = "HTTP/1.1"
+    latency: LatencyDistribution = LatencyDistribution("constant:ms=0")
+    # headers and body written as separate small segments on a keep-alive
+    # connection run into Nagle plus delayed ACK, a ~40ms floor per call;
+    # buffer the response so it is sent in one write and disable Nagle
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _reply(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply({"success": True, "data": "ok"})
+
+    def do_POST(self):
+        body = self._read_body()
+        time.sleep(self.latency.sample())
+
+        if self.path == "/create_jobs":
+            self._reply({"success": True, "data": [
+                {"success": True, "job_id": job["job_id"]} for job in body["jobs"]
+            ]})
+        elif self.path == "/create_job":
+            self._reply({"success": True, "job_id": body["job_id"]})
+        else:
+            self._reply({"success": True, "data": {"path": self.path, "input": body}})
+
+    def do_DELETE(self):
+        time.sleep(self.latency.sample())
+        self._reply({"success": True, "data": "removed"})
+
+
+def start_fake_executor(latency: str, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    handler = type("Handler", (FakeExecutorHandler,), {
+        "latency": LatencyDistribution(latency)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
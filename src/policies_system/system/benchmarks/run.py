@@ -0,0 +1,317 @@
+"""Offline load benchmarks for the policies system API.
+
+Everything runs on this machine: the API is served by a threaded werkzeug
+server, MongoDB is replaced by mongomock (or a local mongod with --db-url)
+and executors are fake HTTP servers with a configurable latency
+distribution. Run from the `system` directory:
+
+    python -m benchmarks.run call_function --requests 2000 --concurrency 32
+    python -m benchmarks.run graph_wide --width 16 --latency lognormal:median=20,sigma=0.5
+    python -m benchmarks.run graph_deep --depth 10 --latency constant:ms=5
+    python -m benchmarks.run jobs_burst --bursts 20 --burst-size 50 [--batch]
+
+Pass --json to get the report as a single JSON object for comparisons.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Callable, Dict, List
+
+import requests
+
+from .fake_executor import start_fake_executor
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(name: str, latencies: List[float], errors: int, elapsed: float) -> Dict:
+    values = sorted(latencies)
+    total = len(values)
+    return {
+        "scenario": name,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "mean_ms": sum(values) / total * 1000 if total else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p90_ms": percentile(values, 90) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0,
+    }
+
+
+def run_load(send: Callable[[requests.Session, int], requests.Response],
+             total: int, concurrency: int):
+    """Issues `total` requests from `concurrency` threads, each with its own session."""
+
+    latencies = []
+    errors = [0]
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                response = send(session, index)
+                ok = response.status_code < 400 and response.json().get("success", False)
+            except Exception:
+                ok = False
+            latency = time.perf_counter() - started
+
+            with lock:
+                latencies.append(latency)
+                if not ok:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - started
+
+
+class BenchmarkEnvironment:
+    """Seeds the database, starts fake executors and serves the API on a free port."""
+
+    def __init__(self, args):
+        self.args = args
+
+        if args.db_url:
+            os.environ["DB_URL"] = args.db_url
+        else:
+            import mongomock
+            from core.mongo import set_mongo_client
+            set_mongo_client(mongomock.MongoClient())
+
+        # imported after the client is in place, the DB wrappers connect on import
+        from core.apis import app
+        from core.db import ExecutorsDB, FunctionsDB, GraphsDB
+        from core.schema import PolicyExecutors, Function, Graph
+
+        self.executors_db = ExecutorsDB()
+        self.functions_db = FunctionsDB()
+        self.graphs_db = GraphsDB()
+        self.Function = Function
+        self.Graph = Graph
+
+        self.executor_servers = [start_fake_executor(args.latency)
+                                 for _ in range(args.executors)]
+        self.executor_ids = []
+        for index, server in enumerate(self.executor_servers):
+            executor_id = f"bench-executor-{index}"
+            self.executors_db.delete(executor_id)
+            self.executors_db.create(PolicyExecutors.from_dict({
+                "executor_id": executor_id,
+                "executor_host_uri": f"http://127.0.0.1:{server.server_port}",
+                "executor_metadata": {},
+                "executor_hardware_info": {"clusterId": f"bench-cluster-{index}"},
+            }))
+            self.executor_ids.append(executor_id)
+
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def create_functions(self, prefix: str, count: int) -> List[str]:
+        function_ids = []
+        for index in range(count):
+            function_id = f"{prefix}-{index}"
+            executor_index = index % len(self.executor_servers)
+            self.functions_db.delete(function_id)
+            self.functions_db.create(self.Function.from_dict({
+                "function_id": function_id,
+                "function_executor_id": self.executor_ids[executor_index],
+                "function_executor_uri": f"http://127.0.0.1:{self.executor_servers[executor_index].server_port}",
+                "function_metadata": {},
+                "function_tags": [],
+                "function_policy_rule_uri": f"{function_id}:1.0-bench",
+                "function_policy_data": {},
+            }))
+            function_ids.append(function_id)
+        return function_ids
+
+    def create_graph(self, name: str, function_ids: List[str], connections: Dict[str, List[str]]) -> str:
+        graph = self.Graph.from_dict({
+            "graph_name": name,
+            "graph_version": "1.0",
+            "graph_release_tag": "bench",
+            "graph_metadata": {},
+            "graph_function_ids": function_ids,
+            "graph_connection_data": connections,
+            "graph_search_tags": [],
+            "graph_description": "benchmark graph",
+            "graph_input_schema": {},
+            "graph_output_schema": {},
+        })
+        self.graphs_db.delete(graph.graph_uri)
+        self.graphs_db.create(graph)
+        return graph.graph_uri
+
+    def close(self):
+        self.server.shutdown()
+        for server in self.executor_servers:
+            server.shutdown()
+
+
+def scenario_call_function(env: BenchmarkEnvironment, args):
+    function_ids = env.create_functions("bench-fn", args.functions)
+
+    def send(session, index):
+        function_id = function_ids[index % len(function_ids)]
+        return session.post(f"{env.base_url}/function/call_function/{function_id}",
+                            json={"request": index})
+
+    return run_load(send, args.requests, args.concurrency)
+
+
+def _graph_sender(env: BenchmarkEnvironment, graph_uri: str, args):
+    def send(session, index):
+        payload = {"graph_uri": graph_uri, "input_data": {"request": index}}
+        if args.max_concurrency:
+            payload["max_concurrency"] = args.max_concurrency
+        return session.post(f"{env.base_url}/graph/execute_graph", json=payload)
+    return send
+
+
+def scenario_graph_wide(env: BenchmarkEnvironment, args):
+    # source -> width parallel nodes -> sink
+    function_ids = env.create_functions("bench-wide", args.width + 2)
+    source, branches, sink = function_ids[0], function_ids[1:-1], function_ids[-1]
+    connections = {source: list(branches)}
+    for branch in branches:
+        connections[branch] = [sink]
+    graph_uri = env.create_graph("bench-wide", function_ids, connections)
+
+    return run_load(_graph_sender(env, graph_uri, args), args.requests, args.concurrency)
+
+
+def scenario_graph_deep(env: BenchmarkEnvironment, args):
+    function_ids = env.create_functions("bench-deep", args.depth)
+    connections = {src: [dst] for src, dst in zip(function_ids, function_ids[1:])}
+    graph_uri = env.create_graph("bench-deep", function_ids, connections)
+
+    return run_load(_graph_sender(env, graph_uri, args), args.requests, args.concurrency)
+
+
+def scenario_jobs_burst(env: BenchmarkEnvironment, args):
+    """Fires bursts of job submissions at once, pausing between bursts.
+
+    With --batch every burst is one request to /jobs/submit/batch; latencies
+    are then per batch rather than per job.
+    """
+
+    latencies = []
+    errors = 0
+    elapsed = 0.0
+
+    def job(index):
+        return {
+            "name": f"bench-job-{index}",
+            "policy_rule_uri": "bench-job:1.0-bench",
+            "inputs": {"request": index},
+        }
+
+    for burst in range(args.bursts):
+        if args.batch:
+            def send(session, index):
+                jobs = [dict(job(index * args.burst_size + offset),
+                             executor_id=env.executor_ids[offset % len(env.executor_ids)])
+                        for offset in range(args.burst_size)]
+                return session.post(f"{env.base_url}/jobs/submit/batch", json={"jobs": jobs})
+            result = run_load(send, 1, 1)
+        else:
+            def send(session, index):
+                executor_id = env.executor_ids[index % len(env.executor_ids)]
+                return session.post(f"{env.base_url}/jobs/submit/{executor_id}",
+                                    json=job(burst * args.burst_size + index))
+            result = run_load(send, args.burst_size, args.burst_size)
+
+        latencies.extend(result[0])
+        errors += result[1]
+        elapsed += result[2]
+        time.sleep(args.burst_interval)
+
+    return latencies, errors, elapsed
+
+
+SCENARIOS = {
+    "call_function": scenario_call_function,
+    "graph_wide": scenario_graph_wide,
+    "graph_deep": scenario_graph_deep,
+    "jobs_burst": scenario_jobs_burst,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load benchmarks for the policies system API")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50,
+                        help="requests sent before measuring, to fill caches and pools")
+    parser.add_argument("--latency", default="constant:ms=10",
+                        help="fake executor latency distribution, e.g. lognormal:median=20,sigma=0.5")
+    parser.add_argument("--executors", type=int, default=4)
+    parser.add_argument("--functions", type=int, default=8)
+    parser.add_argument("--width", type=int, default=16)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=50)
+    parser.add_argument("--burst-interval", type=float, default=0.5)
+    parser.add_argument("--batch", action="store_true")
+    parser.add_argument("--db-url", default=None,
+                        help="use a local mongod instead of mongomock")
+    parser.add_argument("--json", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    env = BenchmarkEnvironment(args)
+    scenario = SCENARIOS[args.scenario]
+
+    try:
+        if args.warmup and args.scenario != "jobs_burst":
+            scenario(env, argparse.Namespace(**dict(
+                vars(args), requests=args.warmup)))
+
+        report = summarize(args.scenario, *scenario(env, args))
+        report["latency"] = args.latency
+        report["concurrency"] = args.burst_size if args.scenario == "jobs_burst" else args.concurrency
+    finally:
+        env.close()
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>16}: {value:.2f}" if isinstance(value, float) else f"{key:>16}: {value}")
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# the services run with their own directory on sys.path and import `core`
+# as a top-level package; this conftest puts it there for pytest as well
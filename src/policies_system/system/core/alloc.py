@@ -1,13 +1,17 @@
-import requests
 import os
+import time
 
-from .db import ExecutorsDB
+from .inventory import cluster_inventory
+from .sessions import get_session, get_timeout
+from .metrics import ALLOCATOR_LATENCY
 
 
 class ResourceAllocatorClient:
     def __init__(self):
 
         self.base_url = os.getenv("RESOURCE_ALLOCATOR_API_URL", "http://localhost:7777")
+        self.session = get_session(self.base_url)
+        self.timeout = get_timeout()
 
     def allocate_resources(self, policy_rule_uri: str, clusters: list, inputs: dict, parameters: dict = None, settings: dict = None):
 
@@ -20,26 +24,27 @@ class ResourceAllocatorClient:
             "settings": settings or {}
         }
 
-        response = requests.post(url, json=payload)
-        response_data = response.json()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self.session.post(url, json=payload, timeout=self.timeout)
+            response_data = response.json()
 
-        if response.status_code == 200 and response_data.get("success", False):
-            return response_data["data"]
-        else:
-            raise Exception(response_data.get(
-                "message", "Unknown error occurred"))
+            if response.status_code == 200 and response_data.get("success", False):
+                outcome = "success"
+                return response_data["data"]
+            else:
+                raise Exception(response_data.get(
+                    "message", "Unknown error occurred"))
+        finally:
+            ALLOCATOR_LATENCY.labels(inputs.get("mode", "unknown"), outcome).observe(
+                time.perf_counter() - started)
 
 
 def alloc_resource_func(resource_allocator_policy_uri: str, settings: dict, parameters: dict):
     try:
 
-        executors = ExecutorsDB()
-        docs = executors.query({})
-
-        clusters = []
-        for doc in docs:
-            cluster_id = doc.executor_hardware_info['clusterId']
-            clusters.append(cluster_id)
+        clusters = cluster_inventory.cluster_ids()
 
         resource_alloc = ResourceAllocatorClient()
         response = resource_alloc.allocate_resources(
@@ -60,13 +65,7 @@ def alloc_resource_func(resource_allocator_policy_uri: str, settings: dict, para
 def alloc_resource_job(resource_allocator_policy_uri: str, settings: dict, parameters: dict):
     try:
 
-        executors = ExecutorsDB()
-        docs = executors.query({})
-
-        clusters = []
-        for doc in docs:
-            cluster_id = doc.executor_hardware_info['clusterId']
-            clusters.append(cluster_id)
+        clusters = cluster_inventory.cluster_ids()
 
         resource_alloc = ResourceAllocatorClient()
         response = resource_alloc.allocate_resources(
@@ -1,18 +1,49 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+import os
 import uuid
+import json
+import time
 from .schema import PolicyRule, PolicyExecutors, Function, Graph
-from .db import PolicyDB, ExecutorsDB, FunctionsDB, GraphsDB
+from .db import PolicyDB, ExecutorsDB, FunctionsDB, GraphsDB, FUNCTION_ROUTING_FIELDS
 from .executor_proxy import ExecutorProxyClient
+from .routing import call_function_routed
 from .jobs import JobsSubmittorClient, PolicyJobs, PolicyJobsDB
-from .graph import execute_graph
+from .graph import execute_graph, execute_graph_traced, get_execution_plan, run_graph
 from .alloc import alloc_resource_func, alloc_resource_job
-from .k8s import ExecutorInitializer
+from .inventory import cluster_inventory
+from .health import health_prober
+from .job_events import job_event_hub, is_final
+from .k8s import ExecutorInitializer, provision_executors, remove_executors
+from .mongo import get_pool_metrics
+from .query import QueryOptions, DocumentPage
+from .metrics import render_metrics, observe_request, HTTP_REQUESTS_IN_FLIGHT
 
 import logging
 
 app = Flask(__name__)
 policy_db = PolicyDB()
 
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    # labelled by rule rather than path so ids do not blow up cardinality
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    observe_request(route, request.method, response.status_code,
+                    time.perf_counter() - g.request_started)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if "request_started" in g:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+
+
 def success_response(data):
     return jsonify({"success": True, "data": data})
 
@@ -21,6 +52,23 @@ def error_response(message):
     return jsonify({"success": False, "message": message})
 
 
+def query_response(collection, query_filter: dict, options: QueryOptions):
+    """Answers a /query endpoint with pagination, projection or NDJSON streaming."""
+    page = DocumentPage(collection, query_filter, options)
+
+    if not options.stream:
+        documents = list(page)
+        return jsonify({"success": True, "data": documents, "next_cursor": page.next_cursor})
+
+    def generate():
+        for document in page:
+            yield json.dumps(document, default=str) + "\n"
+        if options.limit is not None:
+            yield json.dumps({"next_cursor": page.next_cursor}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 @app.route("/policy", methods=["POST"])
 def create_policy():
     try:
@@ -73,6 +121,10 @@ def delete_policy(policy_rule_uri):
 def query_policies():
     try:
         query_filter = request.json
+        options = QueryOptions.from_args(request.args, "policies")
+        if not options.is_plain:
+            return query_response(policy_db.collection, query_filter, options)
+
         policies = policy_db.query(query_filter)
         return jsonify({"success": True, "data": [policy.to_dict() for policy in policies]})
     except Exception as e:
@@ -131,6 +183,10 @@ def delete_executor(executor_id):
 def query_executors():
     try:
         query_filter = request.json
+        options = QueryOptions.from_args(request.args, "executors")
+        if not options.is_plain:
+            return query_response(ExecutorsDB().collection, query_filter, options)
+
         executors = ExecutorsDB().query(query_filter)
         return jsonify({"success": True, "data": [executor.to_dict() for executor in executors]})
     except Exception as e:
@@ -146,7 +202,8 @@ def execute_policy(executor_id):
             return jsonify({"success": False, "message": "Executor not found"}), 404
 
         # Initialize ExecutorProxyClient
-        client = ExecutorProxyClient(base_url=executor.executor_host_uri)
+        client = ExecutorProxyClient(
+            base_url=executor.executor_host_uri, executor_id=executor.executor_id)
 
         # Extract payload
         data = request.json
@@ -187,7 +244,8 @@ def create_deployment(executor_id):
             return jsonify({"success": False, "message": "Executor not found"}), 404
 
         # Initialize ExecutorProxyClient
-        client = ExecutorProxyClient(base_url=executor_host_uri)
+        client = ExecutorProxyClient(
+            base_url=executor_host_uri, executor_id=executor_id)
 
         # Extract payload
         data = request.json
@@ -216,7 +274,8 @@ def create_deployment(executor_id):
             "function_metadata": data.get('function_metadata', {}),
             "function_tags": data.get('function_tags', []),
             "function_policy_rule_uri": policy_rule_uri,
-            "function_policy_data": result.to_dict()
+            "function_policy_data": result.to_dict(),
+            "function_replica_uris": data.get('function_replica_uris', [])
         }
 
         function_dtc = Function.from_dict(function)
@@ -239,7 +298,8 @@ def remove_deployment(name):
             return jsonify({"success": False, "message": "Executor not found"}), 404
 
         # Initialize ExecutorProxyClient
-        client = ExecutorProxyClient(base_url=executor_host_uri)
+        client = ExecutorProxyClient(
+            base_url=executor_host_uri, executor_id=function.function_executor_id)
 
         # Remove deployment
         result = client.remove_deployment(name)
@@ -263,16 +323,15 @@ def call_function(name):
         if not executor_host_uri:
             return jsonify({"success": False, "message": "Executor not found"}), 404
 
-        # Initialize ExecutorProxyClient
-        client = ExecutorProxyClient(base_url=executor_host_uri)
-
         # Extract payload
         input_data = request.json
         if not input_data:
             return jsonify({"success": False, "message": "input_data is required"}), 400
 
-        # Call function
-        result = client.call_function(name, input_data)
+        # Call function on the least loaded of its executors
+        route = {field: getattr(function, field)
+                 for field in FUNCTION_ROUTING_FIELDS}
+        result = call_function_routed(route, name, input_data)
         return jsonify({"success": True, "data": result})
 
     except Exception as e:
@@ -299,6 +358,10 @@ def query_functions():
         if not isinstance(query_filter, dict):
             return jsonify({"success": False, "message": "Invalid query filter."}), 400
 
+        options = QueryOptions.from_args(request.args, "functions")
+        if not options.is_plain:
+            return query_response(FunctionsDB().collection, query_filter, options)
+
         functions = FunctionsDB().query(query_filter)
         return jsonify({"success": True, "data": [function.to_dict() for function in functions]}), 200
     except Exception as e:
@@ -358,6 +421,10 @@ def delete_graph(graph_uri):
 def query_graphs():
     try:
         query_filter = request.get_json()
+        options = QueryOptions.from_args(request.args, "graphs")
+        if not options.is_plain:
+            return query_response(GraphsDB().collection, query_filter, options)
+
         results = GraphsDB().query(query_filter)
         return success_response([graph.to_dict() for graph in results])
     except Exception as e:
@@ -375,7 +442,13 @@ def execute_graph_api():
         if not graph_uri or not input_data:
             return jsonify({"success": False, "message": "Missing 'graph_uri' or 'input_data' in the request body."}), 400
 
-        result = execute_graph(graph_uri, input_data)
+        if data.get("trace") or request.args.get("trace", "false").lower() == "true":
+            result, trace = execute_graph_traced(
+                graph_uri, input_data, max_concurrency=data.get("max_concurrency"))
+            return jsonify({"success": True, "data": result, "trace": trace}), 200
+
+        result = execute_graph(
+            graph_uri, input_data, max_concurrency=data.get("max_concurrency"))
 
         return jsonify({"success": True, "data": result}), 200
 
@@ -383,6 +456,69 @@ def execute_graph_api():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def _format_graph_event(event: dict, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+
+@app.route('/graph/execute_graph/stream', methods=['POST'])
+def execute_graph_stream_api():
+
+    try:
+        data = request.get_json()
+        graph_uri = data.get("graph_uri")
+        input_data = data.get("input_data")
+        stream_format = data.get("format", "ndjson")
+        include_outputs = data.get("include_outputs", True)
+
+        if not graph_uri or not input_data:
+            return jsonify({"success": False, "message": "Missing 'graph_uri' or 'input_data' in the request body."}), 400
+
+        if stream_format not in ("ndjson", "sse"):
+            return jsonify({"success": False, "message": "'format' must be 'ndjson' or 'sse'."}), 400
+
+        plan = get_execution_plan(graph_uri)
+        plan.resolve_endpoints(FunctionsDB())
+
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error executing graph: {str(e)}"}), 500
+
+    def generate():
+        started = time.perf_counter()
+        function_outputs = {}
+        try:
+            for result in run_graph(plan, input_data, data.get("max_concurrency")):
+                event = {
+                    "event": "node",
+                    "function_id": result.function_id,
+                    "latency_ms": result.latency * 1000,
+                }
+                if include_outputs:
+                    event["output"] = result.output
+                else:
+                    event["output_bytes"] = len(json.dumps(result.output))
+                yield _format_graph_event(event, stream_format)
+                function_outputs[result.function_id] = result.output
+
+            yield _format_graph_event({
+                "event": "result",
+                "success": True,
+                "data": function_outputs[plan.leaf_node],
+                "latency_ms": (time.perf_counter() - started) * 1000,
+            }, stream_format)
+
+        except Exception as e:
+            yield _format_graph_event({
+                "event": "error",
+                "success": False,
+                "message": f"Error executing graph: {str(e)}",
+            }, stream_format)
+
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
 @app.route("/jobs/submit/<executor_id>", methods=['POST'])
 def submit_function(executor_id: str):
     try:
@@ -423,7 +559,8 @@ def submit_function(executor_id: str):
             return jsonify({"success": False, "message": "Missing required parameters: 'name' or 'policy_rule_uri'"}), 400
 
         # Initialize the JobsSubmittorClient with the executor's base URI
-        client = JobsSubmittorClient(api_url=base_uri)
+        client = JobsSubmittorClient(
+            api_url=base_uri, executor_id=executor.executor_id)
 
         # Submit the job using the client
         response = client.submit_job(
@@ -445,6 +582,87 @@ def submit_function(executor_id: str):
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@app.route("/jobs/submit/batch", methods=['POST'])
+def submit_functions_batch():
+    try:
+        data = request.get_json()
+        jobs = data.get("jobs")
+        if not isinstance(jobs, list) or not jobs:
+            return jsonify({"success": False, "message": "'jobs' must be a non-empty list"}), 400
+
+        executors = cluster_inventory.executors_by_id()
+
+        default_executor_id = data.get("executor_id", "")
+        if default_executor_id == "" and any(not job.get("executor_id") for job in jobs):
+            if "alloc" not in data:
+                return jsonify({"success": False, "message": "'alloc' is required for jobs without 'executor_id'"}), 400
+            default_executor_id, _ = alloc_resource_job(
+                data['alloc']['resource_allocator_policy_uri'],
+                data['alloc']['settings'],
+                data['alloc']['parameters'])
+
+        job_ids = [None] * len(jobs)
+        errors = []
+        grouped = {}
+
+        for index, job in enumerate(jobs):
+            if not job.get("name") or not job.get("policy_rule_uri"):
+                errors.append({"index": index, "message": "Missing required parameters: 'name' or 'policy_rule_uri'"})
+                continue
+
+            executor_id = job.get("executor_id") or default_executor_id
+            executor = executors.get(executor_id)
+            if not executor or not executor.executor_host_uri:
+                errors.append({"index": index, "message": f"Executor '{executor_id}' not found"})
+                continue
+
+            job_id = str(uuid.uuid4())
+            grouped.setdefault((executor.executor_id, executor.executor_host_uri), []).append((index, {
+                "name": job["name"],
+                "policy_rule_uri": job["policy_rule_uri"],
+                "job_id": job_id,
+                "policy_rule_parameters": job.get("policy_rule_parameters", {}),
+                "node_selector": job.get("node_selector", {}),
+                "inputs": job.get("inputs", {})
+            }))
+
+        for (executor_id, base_uri), entries in grouped.items():
+            response = JobsSubmittorClient(
+                api_url=base_uri, executor_id=executor_id).submit_jobs(
+                [payload for _, payload in entries])
+
+            if not response.get("success"):
+                for index, _ in entries:
+                    errors.append({"index": index, "message": response.get("message", "Unknown error")})
+                continue
+
+            results = response.get("data") or []
+            for position, (index, payload) in enumerate(entries):
+                if position >= len(results):
+                    errors.append({"index": index, "message": f"Executor '{executor_id}' returned no result for this job"})
+                elif results[position].get("success"):
+                    job_ids[index] = payload["job_id"]
+                else:
+                    errors.append({"index": index, "message": results[position].get("message", "Unknown error")})
+
+        errors.sort(key=lambda error: error["index"])
+        if not errors:
+            return jsonify({"success": True, "job_ids": job_ids}), 201
+
+        messages = {error["index"]: error["message"] for error in errors}
+        results = [
+            {"index": index, "success": job_ids[index] is not None,
+             "job_id": job_ids[index], "message": messages.get(index)}
+            for index in range(len(jobs))
+        ]
+        # 207 when part of the batch was submitted, those jobs are running
+        status_code = 207 if any(job_ids) else 500
+        return jsonify({"success": False, "job_ids": job_ids, "errors": errors, "results": results}), status_code
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 @app.route('/jobs/<job_id>', methods=['GET'])
 def get_job(job_id):
     try:
@@ -456,12 +674,52 @@ def get_job(job_id):
         return error_response(f"Error: {str(e)}")
 
 
+def _wait_timeout(default: str) -> float:
+    timeout = float(request.args.get("timeout", default))
+    return max(0.0, min(timeout, float(os.getenv("JOB_WAIT_MAX_TIMEOUT", "300"))))
+
+
+@app.route('/jobs/<job_id>/wait', methods=['GET'])
+def wait_for_job(job_id):
+    """Long poll: returns once the job reaches a final status or the timeout expires."""
+    try:
+        job = job_event_hub.wait(job_id, _wait_timeout("30"))
+        return jsonify({"success": True, "data": job, "completed": is_final(job)})
+    except Exception as e:
+        return error_response(f"Error: {str(e)}")
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events with every status update of the job, closed once it is final."""
+    timeout = _wait_timeout("300")
+    heartbeat = float(os.getenv("JOB_EVENTS_HEARTBEAT", "15"))
+
+    def generate():
+        try:
+            for job in job_event_hub.stream(job_id, timeout, heartbeat):
+                if job is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                event = "completed" if is_final(job) else "status"
+                yield f"event: {event}\ndata: {json.dumps(job, default=str)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
+
+
 @app.route('/jobs/query', methods=['POST'])
 def query_jobs():
     try:
         query_filter = request.get_json()
         if not isinstance(query_filter, dict):
             return error_response("Invalid query filter format.")
+        options = QueryOptions.from_args(request.args, "policy_jobs")
+        if not options.is_plain:
+            return query_response(PolicyJobsDB().collection, query_filter, options)
+
         results = PolicyJobsDB().query(query_filter)
         return success_response([job.to_dict() for job in results])
     except Exception as e:
@@ -490,6 +748,34 @@ def remove_infra(executor_id):
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@app.route("/executors/create-infra", methods=["POST"])
+def create_infra_bulk():
+    """Provisions executors on several clusters in parallel; reports status per cluster."""
+    try:
+        data = request.json
+        specs = data.get("executors", [])
+        if not specs:
+            return jsonify({"success": False, "message": "'executors' is required"}), 400
+
+        results = provision_executors(
+            specs, wait=data.get("wait", True), timeout=data.get("timeout"))
+        success = all(result["success"] for result in results)
+        return jsonify({"success": success, "data": results}), 200 if success else 500
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route("/executors/remove-infra", methods=["DELETE"])
+def remove_infra_bulk():
+    try:
+        data = request.json
+        results = remove_executors(data.get("executors", []))
+        success = all(result["success"] for result in results)
+        return jsonify({"success": success, "data": results}), 200 if success else 500
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 @app.route('/jobs/submit-with-estimate/<executor_id>', methods=['POST'])
 def create_job_with_estimate(executor_id):
     try:
@@ -515,7 +801,8 @@ def create_job_with_estimate(executor_id):
         if not base_uri:
             return jsonify({"success": False, "message": "Executor host URI not found"}), 400
 
-        executor_client = ExecutorProxyClient(base_uri)
+        executor_client = ExecutorProxyClient(
+            base_uri, executor_id=executor.executor_id)
 
         result = executor_client.create_job_with_estimate(
             name=data["name"],
@@ -544,7 +831,8 @@ def estimate_deployment(executor_id):
         if not base_uri:
             return jsonify({"success": False, "message": "Executor host URI not found"}), 400
 
-        executor_client = ExecutorProxyClient(base_uri)
+        executor_client = ExecutorProxyClient(
+            base_uri, executor_id=executor.executor_id)
 
         result = executor_client.estimate_deployment(
             mode=data["mode"],
@@ -570,7 +858,8 @@ def create_deployment_with_estimate(executor_id):
         if not base_uri:
             return jsonify({"success": False, "message": "Executor host URI not found"}), 400
 
-        executor_client = ExecutorProxyClient(base_uri)
+        executor_client = ExecutorProxyClient(
+            base_uri, executor_id=executor.executor_id)
 
         result = executor_client.create_deployment_with_estimate(
             name=data["name"],
@@ -600,7 +889,8 @@ def estimate_graph_adhoc(executor_id: str):
         if not base_uri:
             return jsonify({"success": False, "message": "Executor host URI not found"}), 400
 
-        executor_client = ExecutorProxyClient(base_uri)
+        executor_client = ExecutorProxyClient(
+            base_uri, executor_id=executor.executor_id)
         response = executor_client.estimate_graph(policies)
         return {"success": True, "data": response}
 
@@ -624,7 +914,8 @@ def deploy_adhoc_graph(executor_id: str):
         if not base_uri:
             return jsonify({"success": False, "message": "Executor host URI not found"}), 400
 
-        executor_client = ExecutorProxyClient(base_uri)
+        executor_client = ExecutorProxyClient(
+            base_uri, executor_id=executor.executor_id)
         executor_client.deploy_adhoc_graph(
             policy_db, graph_db=GraphsDB(), data=data)
 
@@ -650,7 +941,8 @@ def remove_executor(executor_id: str):
         if not base_uri:
             return jsonify({"success": False, "message": "Executor host URI not found"}), 400
 
-        executor_client = ExecutorProxyClient(base_uri)
+        executor_client = ExecutorProxyClient(
+            base_uri, executor_id=executor.executor_id)
         executor_client.remove_adhoc_graph(
             policy_db, graph_db=GraphsDB(), graph_uri=graph_uri
         )
@@ -661,5 +953,20 @@ def remove_executor(executor_id: str):
         return error_response(str(e))
 
 
+@app.route("/db/pool_metrics", methods=["GET"])
+def db_pool_metrics():
+    try:
+        return success_response(get_pool_metrics())
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 def run_app():
+    health_prober.start()
     app.run(host='0.0.0.0', port=10000)
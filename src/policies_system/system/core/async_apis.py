@@ -0,0 +1,347 @@
+import os
+import sys
+import time
+import uuid
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+import uvicorn
+from quart import Quart, request, jsonify, g
+from werkzeug.exceptions import HTTPException
+
+from .apis import app as wsgi_app
+from .db import PolicyDB, ExecutorsDB, FunctionsDB, GraphsDB, FUNCTION_ROUTING_FIELDS
+from .alloc import alloc_resource_job
+from .graph import execute_graph_traced
+from .health import health_prober
+from .metrics import observe_request, prepare_multiprocess_metrics, HTTP_REQUESTS_IN_FLIGHT
+from .async_runtime import (AsyncExecutorProxyClient, read_document,
+                            execute_graph_async, call_function_routed_async,
+                            close_async_clients)
+
+# Proxy endpoints of the Flask app that are served natively on the event loop.
+# Every other route keeps its Flask implementation and runs in a thread pool.
+ASYNC_ENDPOINTS = {"execute_policy", "call_function",
+                   "execute_graph_api", "submit_function"}
+
+async_app = Quart(__name__)
+
+
+@async_app.before_serving
+async def start_cache_watchers():
+    # constructing the sync wrappers starts the cache invalidation watchers
+    await asyncio.to_thread(lambda: [PolicyDB(), ExecutorsDB(), FunctionsDB(), GraphsDB()])
+    health_prober.start()
+
+
+@async_app.after_serving
+async def stop_clients():
+    await close_async_clients()
+
+
+@async_app.before_request
+async def start_request_metrics():
+    g.request_started = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+
+
+@async_app.after_request
+async def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    observe_request(route, request.method, response.status_code,
+                    time.perf_counter() - g.request_started)
+    return response
+
+
+@async_app.teardown_request
+async def finish_request_metrics(exc):
+    if "request_started" in g:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+
+
+@async_app.route("/executor/<executor_id>/execute_policy", methods=["POST"])
+async def execute_policy(executor_id):
+    try:
+        # Extract executor_host_uri
+        executor = await read_document("executors", "executor_id", executor_id)
+        if not executor:
+            return jsonify({"success": False, "message": "Executor not found"}), 404
+
+        client = AsyncExecutorProxyClient(
+            executor["executor_host_uri"], executor_id)
+
+        # Extract payload
+        data = await request.get_json()
+        policy_rule_uri = data.get("policy_rule_uri")
+        input_data = data.get("input_data")
+        parameters = data.get("parameters")
+
+        if not policy_rule_uri or not input_data:
+            return jsonify({"success": False, "message": "policy_rule_uri and input_data are required"}), 400
+
+        # Execute policy
+        result = await client.execute_policy(policy_rule_uri, input_data, parameters)
+        return jsonify({"success": True, "data": result})
+
+    except Exception as e:
+        logging.error(f"Error executing policy: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@async_app.route("/function/call_function/<name>", methods=["POST"])
+async def call_function(name):
+    try:
+        # Extract executor_host_uri
+        function = await read_document("functions", "function_id", name)
+        if not function or not function.get("function_executor_uri"):
+            return jsonify({"success": False, "message": "Executor not found"}), 404
+
+        # Extract payload
+        input_data = await request.get_json()
+        if not input_data:
+            return jsonify({"success": False, "message": "input_data is required"}), 400
+
+        # Call function on the least loaded of its executors
+        route = {field: function.get(field) for field in FUNCTION_ROUTING_FIELDS}
+        result = await call_function_routed_async(route, name, input_data)
+        return jsonify({"success": True, "data": result})
+
+    except Exception as e:
+        logging.error(f"Error calling function: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@async_app.route('/graph/execute_graph', methods=['POST'])
+async def execute_graph_api():
+
+    try:
+        data = await request.get_json()
+        graph_uri = data.get("graph_uri")
+        input_data = data.get("input_data")
+
+        if not graph_uri or not input_data:
+            return jsonify({"success": False, "message": "Missing 'graph_uri' or 'input_data' in the request body."}), 400
+
+        if data.get("trace") or request.args.get("trace", "false").lower() == "true":
+            # traced runs are diagnostic, they use the threaded runtime
+            result, trace = await asyncio.to_thread(
+                execute_graph_traced, graph_uri, input_data, data.get("max_concurrency"))
+            return jsonify({"success": True, "data": result, "trace": trace}), 200
+
+        result = await execute_graph_async(
+            graph_uri, input_data, max_concurrency=data.get("max_concurrency"))
+
+        return jsonify({"success": True, "data": result}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@async_app.route("/jobs/submit/<executor_id>", methods=['POST'])
+async def submit_function(executor_id: str):
+    try:
+        data = await request.get_json()
+
+        if executor_id == "":
+            resource_allocator_policy_uri = data['alloc']['resource_allocator_policy_uri']
+            settings = data['alloc']['settings']
+            parameters = data['alloc']['parameters']
+
+            executor_id, replicas = await asyncio.to_thread(
+                alloc_resource_job, resource_allocator_policy_uri, settings, parameters)
+            data['replicas'] = replicas
+
+        executor = await read_document("executors", "executor_id", executor_id)
+        if not executor:
+            return jsonify({"success": False, "message": "Executor not found"}), 404
+
+        base_uri = executor.get("executor_host_uri")
+        if not base_uri:
+            return jsonify({"success": False, "message": "Executor host URI not found"}), 400
+
+        # Generate a unique job ID
+        job_id = str(uuid.uuid4())
+
+        name = data.get("name")
+        policy_rule_uri = data.get("policy_rule_uri")
+
+        # Validate required parameters
+        if not name or not policy_rule_uri:
+            return jsonify({"success": False, "message": "Missing required parameters: 'name' or 'policy_rule_uri'"}), 400
+
+        client = AsyncExecutorProxyClient(base_uri, executor_id)
+        response = await client.submit_job({
+            "name": name,
+            "policy_rule_uri": policy_rule_uri,
+            "job_id": job_id,
+            "policy_rule_parameters": data.get("policy_rule_parameters", {}) or {},
+            "node_selector": data.get("node_selector", {}) or {},
+            "inputs": data.get("inputs", {}) or {}
+        })
+
+        # Return the response to the caller
+        if response.get("success"):
+            return jsonify({"success": True, "job_id": job_id}), 201
+        else:
+            return jsonify({"success": False, "message": response.get("message", "Unknown error")}), 500
+
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+def _wsgi_environ(scope, body) -> dict:
+    script_name = scope.get("root_path", "").encode("utf8").decode("latin1")
+    path_info = scope["path"].encode("utf8").decode("latin1")
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class ThreadPoolWsgiToAsgi:
+    """ASGI adapter that runs each WSGI request on its own thread from a pool.
+
+    asgiref's WsgiToAsgi runs WSGI apps thread_sensitive, i.e. every request
+    of the worker on one shared thread, so a long poll or a streamed response
+    would hold up all other Flask routes.
+    """
+
+    def __init__(self, wsgi_application, max_workers: int):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(f"WSGI routes do not serve '{scope['type']}' connections")
+
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return  # client went away before the body was read
+                body.write(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+
+            def send_from_thread(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            await loop.run_in_executor(
+                self.executor, self._run, _wsgi_environ(scope, body), send_from_thread)
+
+    def _run(self, environ, send):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get("started"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["start"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin1"), value.encode("latin1"))
+                            for name, value in headers],
+            }
+            response["length"] = next(
+                (int(value) for name, value in headers if name.lower() == "content-length"), None)
+
+        def start():
+            if not response.get("started"):
+                response["started"] = True
+                send(response["start"])
+
+        output = self.wsgi_application(environ, start_response)
+        try:
+            remaining = None
+            for chunk in output:
+                start()
+                if remaining is None:
+                    remaining = response["length"]
+                if remaining is not None:
+                    chunk = chunk[:remaining]
+                    remaining -= len(chunk)
+                if chunk:
+                    send({"type": "http.response.body", "body": chunk, "more_body": True})
+                if remaining == 0:
+                    break
+            start()
+            send({"type": "http.response.body"})
+        finally:
+            if hasattr(output, "close"):
+                output.close()
+
+
+class ProxyDispatcher:
+    """ASGI entrypoint serving ASYNC_ENDPOINTS from Quart and everything else from Flask.
+
+    Routing is decided with the Flask url map so both apps agree on which
+    rule a path matches.
+    """
+
+    def __init__(self, async_app: Quart, flask_app):
+        self.async_app = async_app
+        self.flask_app = flask_app
+        self.wsgi = ThreadPoolWsgiToAsgi(
+            flask_app, max_workers=int(os.getenv("WSGI_THREADS", "64")))
+
+    def _is_async(self, scope) -> bool:
+        adapter = self.flask_app.url_map.bind("")
+        try:
+            endpoint, _ = adapter.match(scope["path"], method=scope["method"])
+        except HTTPException:
+            return False
+        return endpoint in ASYNC_ENDPOINTS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan" or (scope["type"] == "http" and self._is_async(scope)):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+
+asgi_app = ProxyDispatcher(async_app, wsgi_app)
+
+
+def run_async_app():
+    workers = int(os.getenv("ASGI_WORKERS", "4"))
+    prepare_multiprocess_metrics(workers)
+    uvicorn.run(
+        "core.async_apis:asgi_app",
+        host='0.0.0.0',
+        port=10000,
+        workers=workers,
+    )
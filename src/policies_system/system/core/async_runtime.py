@@ -0,0 +1,274 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from .mongo import get_client_options, async_pool_metrics, command_metrics
+from .cache import get_metadata_cache
+from .db import FUNCTION_ROUTING_FIELDS
+from .plan import GraphExecutionPlan, plan_cache
+from .graph import resolve_max_concurrency
+from .executor_proxy import handle_response
+from .sessions import get_timeout
+from .memo import node_output_cache
+from .metrics import observe_node, track_upstream, HEDGED_REQUESTS
+from .health import circuit_breakers, ExecutorUnavailable
+from .routing import (outstanding, latency_window, route_targets,
+                      hedge_delay, executor_id_for)
+
+logger = logging.getLogger(__name__)
+
+_mongo_client = None
+_http_client = None
+
+
+def get_async_mongo_client() -> AsyncIOMotorClient:
+    """Motor client of this worker process; shares pool settings with the sync client."""
+    global _mongo_client
+
+    if _mongo_client is None:
+        db_url = os.getenv("DB_URL", "mongodb://localhost:27017/policies")
+        if not db_url:
+            raise ValueError("Environment variable 'DB_URL' is not set.")
+        _mongo_client = AsyncIOMotorClient(
+            db_url, event_listeners=[async_pool_metrics, command_metrics], **get_client_options())
+    return _mongo_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _http_client
+
+    if _http_client is None:
+        connect_timeout, read_timeout = get_timeout()
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=int(
+                    os.getenv("EXECUTOR_POOL_MAXSIZE", "64")) * 4,
+                max_keepalive_connections=int(
+                    os.getenv("EXECUTOR_POOL_MAXSIZE", "64"))),
+            transport=httpx.AsyncHTTPTransport(
+                retries=int(os.getenv("EXECUTOR_MAX_RETRIES", "3"))),
+        )
+    return _http_client
+
+
+async def close_async_clients():
+    global _http_client, _mongo_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _mongo_client is not None:
+        _mongo_client.close()
+        _mongo_client = None
+
+
+async def read_document(collection_name: str, key_field: str, key: str) -> Optional[Dict]:
+    """Async counterpart of the DB wrappers' read(), backed by the same metadata cache."""
+    cache = get_metadata_cache(collection_name, key_field)
+    document = cache.get(key)
+    if document is None:
+        generation = cache.generation()
+        collection = get_async_mongo_client()["policies"][collection_name]
+        document = await collection.find_one({key_field: key})
+        if document:
+            cache.put(key, document, generation)
+    return document
+
+
+class AsyncExecutorProxyClient:
+    def __init__(self, base_url: str, executor_id: str = None):
+        self.base_url = base_url.rstrip('/')
+        self.executor_id = executor_id or self.base_url
+        self.client = get_async_http_client()
+
+    async def _post(self, operation, url, raise_for_status=False, **kwargs):
+        breaker = circuit_breakers.get(self.base_url)
+        with track_upstream(self.executor_id, operation), breaker.attempt():
+            try:
+                response = await self.client.post(url, **kwargs)
+            except httpx.TransportError:
+                breaker.record_failure()
+                raise
+            breaker.record_status(response.status_code)
+            if raise_for_status:
+                response.raise_for_status()
+            return response
+
+    async def execute_policy(self, policy_rule_uri, input_data, parameters=None):
+        url = f"{self.base_url}/execute_policy"
+        payload = {
+            "policy_rule_uri": policy_rule_uri,
+            "input_data": input_data,
+            "parameters": parameters
+        }
+        response = await self._post("execute_policy", url, json=payload)
+        return handle_response(response)
+
+    async def call_function(self, name, input_data):
+        url = f"{self.base_url}/call_function/{name}"
+        response = await self._post("call_function", url, json=input_data)
+        return handle_response(response)
+
+    async def submit_job(self, payload: dict) -> dict:
+        try:
+            response = await self._post(
+                "create_job", f"{self.base_url}/create_job", raise_for_status=True, json=payload)
+            return response.json()
+        except (httpx.HTTPError, ExecutorUnavailable) as e:
+            logging.error(f"Error submitting job: {e}")
+            return {"success": False, "message": str(e)}
+
+
+async def _attempt_async(route: Dict, uri: str, function_id: str, inputs):
+    with outstanding.track(uri):
+        started = time.perf_counter()
+        client = AsyncExecutorProxyClient(uri, executor_id_for(route, uri))
+        output = await client.call_function(function_id, inputs)
+        latency_window.record(function_id, time.perf_counter() - started)
+        return output
+
+
+async def call_function_routed_async(route: Dict, function_id: str, inputs):
+    """Event-loop version of routing.call_function_routed; the losing call is cancelled."""
+
+    targets = route_targets(route)
+    delay = hedge_delay(route)
+    primary = outstanding.pick(targets)
+
+    if delay is None:
+        return await _attempt_async(route, primary, function_id, inputs)
+
+    primary_task = asyncio.ensure_future(
+        _attempt_async(route, primary, function_id, inputs))
+    pending = {primary_task}
+    hedge_task = None
+
+    done, _ = await asyncio.wait(pending, timeout=delay)
+    if not done or primary_task.exception() is not None:
+        secondary = outstanding.pick(targets, exclude=[primary])
+        hedge_task = asyncio.ensure_future(
+            _attempt_async(route, secondary, function_id, inputs))
+        pending.add(hedge_task)
+        HEDGED_REQUESTS.labels(function_id, "sent").inc()
+
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge_task:
+                        HEDGED_REQUESTS.labels(function_id, "won").inc()
+                    return task.result()
+                error = task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+    raise error
+
+
+async def get_execution_plan_async(graph_uri: str) -> GraphExecutionPlan:
+
+    document = await read_document("graphs", "graph_uri", graph_uri)
+    if not document:
+        raise Exception(f"Graph with URI '{graph_uri}' not found.")
+
+    plan = plan_cache.get_or_compile(graph_uri, document)
+
+    missing = plan.unresolved_endpoints()
+    if missing:
+        collection = get_async_mongo_client()["policies"]["functions"]
+        cursor = collection.find(
+            {"function_id": {"$in": missing}},
+            {field: 1 for field in FUNCTION_ROUTING_FIELDS} | {"_id": 0})
+        plan.set_endpoints(
+            missing, {route["function_id"]: route async for route in cursor})
+    return plan
+
+
+async def _run_node_async(plan: GraphExecutionPlan, function_id: str, inputs, ready_at: float):
+    started = time.perf_counter()
+    output = await call_node_async(plan, function_id, inputs)
+    observe_node(function_id, started - ready_at, time.perf_counter() - started)
+    return output
+
+
+async def call_node_async(plan: GraphExecutionPlan, function_id: str, inputs):
+
+    route = plan.endpoints.get(function_id)
+    if not route:
+        route = await read_document("functions", "function_id", function_id)
+        if not route:
+            raise Exception(
+                f"No function with ID '{function_id}' found.")
+        if not route.get("function_executor_uri"):
+            raise Exception(
+                f"Executor URI not specified for function '{function_id}'.")
+        route = {field: route.get(field) for field in FUNCTION_ROUTING_FIELDS}
+        plan.endpoints[function_id] = route
+
+    ttl = node_output_cache.ttl_for(route)
+    if ttl:
+        key = node_output_cache.make_key(route, inputs)
+        hit, output = await asyncio.to_thread(node_output_cache.get, key)
+        if hit:
+            return output
+
+    output = await call_function_routed_async(route, function_id, inputs)
+
+    if ttl:
+        await asyncio.to_thread(node_output_cache.put, key, output, ttl)
+    return output
+
+
+async def execute_graph_async(graph_uri: str, input_data: dict, max_concurrency: int = None) -> dict:
+    """Event-loop version of graph.execute_graph with the same scheduling and output.
+
+    On the first failure all in-flight sibling calls are cancelled.
+    """
+
+    try:
+        plan = await get_execution_plan_async(graph_uri)
+        limit = resolve_max_concurrency(plan, max_concurrency)
+
+        in_degree = dict(plan.in_degree)
+        ready = deque(plan.roots)
+        ready_at = {node: time.perf_counter() for node in plan.roots}
+        in_flight = {}
+        function_outputs = {}
+
+        try:
+            while ready or in_flight:
+                while ready and len(in_flight) < limit:
+                    current_function_id = ready.popleft()
+                    inputs = plan.node_inputs(
+                        current_function_id, function_outputs, input_data)
+                    task = asyncio.ensure_future(_run_node_async(
+                        plan, current_function_id, inputs, ready_at[current_function_id]))
+                    in_flight[task] = current_function_id
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    current_function_id = in_flight.pop(task)
+                    function_outputs[current_function_id] = task.result()
+
+                    for neighbor in plan.successors.get(current_function_id, []):
+                        in_degree[neighbor] -= 1
+                        if in_degree[neighbor] == 0:
+                            ready.append(neighbor)
+                            ready_at[neighbor] = time.perf_counter()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        return function_outputs[plan.leaf_node]
+
+    except Exception as e:
+        raise Exception(f"Error executing graph: {str(e)}")
@@ -0,0 +1,260 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0,
+                 on_evict: Optional[Callable[[Any, Any], None]] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evicted(self, key, value):
+        # called with the lock held
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if self.ttl > 0 and expires_at < time.monotonic():
+                del self._entries[key]
+                self._evicted(key, value)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None and previous[0] is not value:
+                self._evicted(key, previous[0])
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted_key, (evicted, _) = self._entries.popitem(last=False)
+                self._evicted(evicted_key, evicted)
+
+    def pop(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._evicted(key, entry[0])
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            for key, (value, _) in self._entries.items():
+                self._evicted(key, value)
+            self._entries.clear()
+
+    def keys(self) -> List:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def values(self) -> List:
+        with self._lock:
+            return [value for value, _ in self._entries.values()]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class MetadataCache:
+    """Read-through cache for the documents of one collection.
+
+    Entries are keyed by `key_field` and invalidated by a change stream on the
+    collection, by a polling loop when change streams are not available
+    (standalone mongod), and explicitly by writes made through the DB wrappers.
+    Cached documents are shared between callers and must be treated as read-only.
+
+    Readers take generation() before querying the database and pass it to
+    put(); the document is then dropped if the key was invalidated in
+    between, so a stale read cannot be re-cached after a write.
+    """
+
+    def __init__(self, collection_name: str, key_field: str, max_size: int, ttl: float,
+                 poll_interval: float, enabled: bool = True):
+        self.collection_name = collection_name
+        self.key_field = key_field
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        self.cache = TTLCache(max_size=max_size if enabled else 0, ttl=ttl,
+                              on_evict=self._forget_id)
+        self._ids = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        # generation at which each recently invalidated key was invalidated,
+        # keys pruned from it count as invalidated at _pruned_generation
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._max_invalidated = max(max_size, 1)
+        self._pruned_generation = 0
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self._watcher_pid = None
+        self._watcher_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        return self.cache.get(key)
+
+    def _forget_id(self, key: str, document: Dict):
+        if "_id" in document and self._ids.get(document["_id"]) == key:
+            del self._ids[document["_id"]]
+
+    def generation(self) -> int:
+        return self._generation
+
+    def put(self, key: str, document: Dict, generation: Optional[int] = None):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and self._invalidated.get(
+                    key, self._pruned_generation) > generation:
+                return
+            self.cache.put(key, document)
+            if "_id" in document:
+                self._ids[document["_id"]] = key
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drops `key`, or the whole cache when key is None, and notifies listeners."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._invalidated.clear()
+                self._pruned_generation = self._generation
+                self.cache.clear()
+                self._ids.clear()
+            else:
+                self._invalidated[key] = self._generation
+                self._invalidated.move_to_end(key)
+                if len(self._invalidated) > self._max_invalidated:
+                    _, pruned = self._invalidated.popitem(last=False)
+                    self._pruned_generation = max(
+                        self._pruned_generation, pruned)
+                self.cache.pop(key)
+
+        for listener in list(self._listeners):
+            try:
+                listener(key)
+            except Exception as e:
+                logger.error(
+                    f"Cache invalidation listener failed for {self.collection_name}: {e}")
+
+    def add_listener(self, listener: Callable[[Optional[str]], None]):
+        self._listeners.append(listener)
+
+    def ensure_watcher(self, collection):
+        if not self.enabled or self._watcher_pid == os.getpid():
+            return
+
+        with self._watcher_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            thread = threading.Thread(
+                target=self._watch, args=(collection,), daemon=True)
+            thread.start()
+
+    def _watch(self, collection):
+        while True:
+            try:
+                with collection.watch(full_document="updateLookup") as stream:
+                    logger.info(
+                        f"Watching change stream of '{self.collection_name}' for cache invalidation")
+                    # anything written while the stream was down is unknown
+                    self.invalidate()
+                    for change in stream:
+                        self._handle_change(change)
+            except OperationFailure as e:
+                self._fallback_to_polling(collection, e)
+                return
+            except PyMongoError as e:
+                logger.error(
+                    f"Change stream of '{self.collection_name}' failed: {e}")
+                time.sleep(self.poll_interval)
+            except Exception as e:
+                self._fallback_to_polling(collection, e)
+                return
+
+    def _fallback_to_polling(self, collection, error: Exception):
+        logger.warning(
+            f"Change streams unavailable for '{self.collection_name}' ({error}), falling back to polling")
+        self._poll(collection)
+
+    def _handle_change(self, change: Dict):
+        document = change.get("fullDocument") or {}
+        key = document.get(self.key_field)
+        if key is None:
+            document_id = change.get("documentKey", {}).get("_id")
+            key = self._ids.pop(document_id, None)
+            if key is None:
+                # a delete of a document that is not cached
+                if change.get("operationType") == "delete":
+                    return
+                self.invalidate()
+                return
+        self.invalidate(key)
+
+    def _poll(self, collection):
+        while True:
+            time.sleep(self.poll_interval)
+            keys = self.cache.keys()
+            if not keys:
+                continue
+            try:
+                current = {
+                    document[self.key_field]: document
+                    for document in collection.find({self.key_field: {"$in": keys}})
+                }
+                for key in keys:
+                    cached = self.cache.get(key)
+                    if cached is not None and current.get(key) != cached:
+                        self.invalidate(key)
+            except PyMongoError as e:
+                logger.error(
+                    f"Cache polling of '{self.collection_name}' failed: {e}")
+                self.invalidate()
+
+
+_caches: Dict[str, MetadataCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_metadata_cache(collection_name: str, key_field: str) -> MetadataCache:
+    cache = _caches.get(collection_name)
+    if cache is not None:
+        return cache
+
+    with _caches_lock:
+        if collection_name not in _caches:
+            _caches[collection_name] = MetadataCache(
+                collection_name=collection_name,
+                key_field=key_field,
+                max_size=int(os.getenv("METADATA_CACHE_SIZE", "10000")),
+                ttl=float(os.getenv("METADATA_CACHE_TTL", "300")),
+                poll_interval=float(
+                    os.getenv("METADATA_CACHE_POLL_INTERVAL", "5")),
+                enabled=os.getenv("METADATA_CACHE_ENABLED",
+                                  "true").lower() == "true",
+            )
+        return _caches[collection_name]
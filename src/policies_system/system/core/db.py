@@ -1,19 +1,22 @@
-import os
-import pymongo
 from pymongo.errors import PyMongoError
-from typing import Optional, List
+from typing import Optional, List, Dict
 from .schema import PolicyRule, PolicyExecutors, Function, Graph
+from .mongo import get_mongo_client
+from .cache import get_metadata_cache
+
+FUNCTION_ROUTING_FIELDS = [
+    "function_id", "function_executor_id", "function_executor_uri",
+    "function_policy_rule_uri", "function_metadata", "function_replica_uris"]
 
 
 class PolicyDB:
     def __init__(self):
         try:
-            db_url = os.getenv("DB_URL",  "mongodb://localhost:27017/policies")
-            if not db_url:
-                raise ValueError("Environment variable 'DB_URL' is not set.")
-            self.client = pymongo.MongoClient(db_url)
+            self.client = get_mongo_client()
             self.db = self.client["policies"]
             self.collection = self.db["policies"]
+            self.cache = get_metadata_cache("policies", "policy_rule_uri")
+            self.cache.ensure_watcher(self.collection)
         except Exception as e:
             raise RuntimeError(
                 f"Failed to initialize database connection: {e}")
@@ -22,6 +25,7 @@ class PolicyDB:
         try:
             policy_dict = policy.to_dict()
             self.collection.insert_one(policy_dict)
+            self.cache.invalidate(policy.policy_rule_uri)
             return True
         except PyMongoError as e:
             print(f"Error creating policy: {e}")
@@ -29,8 +33,13 @@ class PolicyDB:
 
     def read(self, policy_rule_uri: str) -> Optional[PolicyRule]:
         try:
-            result = self.collection.find_one(
-                {"policy_rule_uri": policy_rule_uri})
+            result = self.cache.get(policy_rule_uri)
+            if result is None:
+                generation = self.cache.generation()
+                result = self.collection.find_one(
+                    {"policy_rule_uri": policy_rule_uri})
+                if result:
+                    self.cache.put(policy_rule_uri, result, generation)
             if result:
                 return PolicyRule.from_dict(result)
             return None
@@ -44,6 +53,9 @@ class PolicyDB:
             result = self.collection.update_one(
                 {"policy_rule_uri": policy_rule_uri}, {"$set": updated_data}
             )
+            self.cache.invalidate(policy_rule_uri)
+            if updated_policy.policy_rule_uri != policy_rule_uri:
+                self.cache.invalidate(updated_policy.policy_rule_uri)
             return result.matched_count > 0
         except PyMongoError as e:
             print(f"Error updating policy: {e}")
@@ -53,6 +65,7 @@ class PolicyDB:
         try:
             result = self.collection.delete_one(
                 {"policy_rule_uri": policy_rule_uri})
+            self.cache.invalidate(policy_rule_uri)
             return result.deleted_count > 0
         except PyMongoError as e:
             print(f"Error deleting policy: {e}")
@@ -70,12 +83,11 @@ class PolicyDB:
 class ExecutorsDB:
     def __init__(self):
         try:
-            db_url = os.getenv("DB_URL",  "mongodb://localhost:27017/policies")
-            if not db_url:
-                raise ValueError("Environment variable 'DB_URL' is not set.")
-            self.client = pymongo.MongoClient(db_url)
+            self.client = get_mongo_client()
             self.db = self.client["policies"]
             self.collection = self.db["executors"]
+            self.cache = get_metadata_cache("executors", "executor_id")
+            self.cache.ensure_watcher(self.collection)
         except Exception as e:
             raise RuntimeError(
                 f"Failed to initialize database connection: {e}")
@@ -84,6 +96,7 @@ class ExecutorsDB:
         try:
             executor_dict = executor.to_dict()
             self.collection.insert_one(executor_dict)
+            self.cache.invalidate(executor.executor_id)
             return True
         except PyMongoError as e:
             print(f"Error creating executor: {e}")
@@ -91,7 +104,12 @@ class ExecutorsDB:
 
     def read(self, executor_id: str) -> Optional[PolicyExecutors]:
         try:
-            result = self.collection.find_one({"executor_id": executor_id})
+            result = self.cache.get(executor_id)
+            if result is None:
+                generation = self.cache.generation()
+                result = self.collection.find_one({"executor_id": executor_id})
+                if result:
+                    self.cache.put(executor_id, result, generation)
             if result:
                 return PolicyExecutors.from_dict(result)
             return None
@@ -105,14 +123,29 @@ class ExecutorsDB:
             result = self.collection.update_one(
                 {"executor_id": executor_id}, {"$set": updated_data}
             )
+            self.cache.invalidate(executor_id)
+            if updated_executor.executor_id != executor_id:
+                self.cache.invalidate(updated_executor.executor_id)
             return result.matched_count > 0
         except PyMongoError as e:
             print(f"Error updating executor: {e}")
             return False
 
+    def set_status(self, executor_id: str, executor_status: str) -> bool:
+        try:
+            result = self.collection.update_one(
+                {"executor_id": executor_id}, {"$set": {"executor_status": executor_status}}
+            )
+            self.cache.invalidate(executor_id)
+            return result.matched_count > 0
+        except PyMongoError as e:
+            print(f"Error updating executor status: {e}")
+            return False
+
     def delete(self, executor_id: str) -> bool:
         try:
             result = self.collection.delete_one({"executor_id": executor_id})
+            self.cache.invalidate(executor_id)
             return result.deleted_count > 0
         except PyMongoError as e:
             print(f"Error deleting executor: {e}")
@@ -130,12 +163,11 @@ class ExecutorsDB:
 class FunctionsDB:
     def __init__(self):
         try:
-            db_url = os.getenv("DB_URL",  "mongodb://localhost:27017/policies")
-            if not db_url:
-                raise ValueError("Environment variable 'DB_URL' is not set.")
-            self.client = pymongo.MongoClient(db_url)
+            self.client = get_mongo_client()
             self.db = self.client["policies"]
             self.collection = self.db["functions"]
+            self.cache = get_metadata_cache("functions", "function_id")
+            self.cache.ensure_watcher(self.collection)
         except Exception as e:
             raise RuntimeError(
                 f"Failed to initialize database connection: {e}")
@@ -144,6 +176,7 @@ class FunctionsDB:
         try:
             function_dict = function.to_dict()
             self.collection.insert_one(function_dict)
+            self.cache.invalidate(function.function_id)
             return True
         except PyMongoError as e:
             print(f"Error creating function: {e}")
@@ -151,7 +184,12 @@ class FunctionsDB:
 
     def read(self, function_id: str) -> Optional[Function]:
         try:
-            result = self.collection.find_one({"function_id": function_id})
+            result = self.cache.get(function_id)
+            if result is None:
+                generation = self.cache.generation()
+                result = self.collection.find_one({"function_id": function_id})
+                if result:
+                    self.cache.put(function_id, result, generation)
             if result:
                 return Function.from_dict(result)
             return None
@@ -159,12 +197,26 @@ class FunctionsDB:
             print(f"Error reading function: {e}")
             return None
 
+    def read_routes(self, function_ids: List[str]) -> Optional[Dict[str, Dict]]:
+        """Fetches only the routing fields of many functions in one query, None on error."""
+        try:
+            results = self.collection.find(
+                {"function_id": {"$in": list(function_ids)}},
+                {field: 1 for field in FUNCTION_ROUTING_FIELDS} | {"_id": 0})
+            return {result["function_id"]: result for result in results}
+        except PyMongoError as e:
+            print(f"Error reading function routes: {e}")
+            return None
+
     def update(self, function_id: str, updated_function: Function) -> bool:
         try:
             updated_data = updated_function.to_dict()
             result = self.collection.update_one(
                 {"function_id": function_id}, {"$set": updated_data}
             )
+            self.cache.invalidate(function_id)
+            if updated_function.function_id != function_id:
+                self.cache.invalidate(updated_function.function_id)
             return result.matched_count > 0
         except PyMongoError as e:
             print(f"Error updating function: {e}")
@@ -173,6 +225,7 @@ class FunctionsDB:
     def delete(self, function_id: str) -> bool:
         try:
             result = self.collection.delete_one({"function_id": function_id})
+            self.cache.invalidate(function_id)
             return result.deleted_count > 0
         except PyMongoError as e:
             print(f"Error deleting function: {e}")
@@ -190,12 +243,11 @@ class FunctionsDB:
 class GraphsDB:
     def __init__(self):
         try:
-            db_url = os.getenv("DB_URL",  "mongodb://localhost:27017/policies")
-            if not db_url:
-                raise ValueError("Environment variable 'DB_URL' is not set.")
-            self.client = pymongo.MongoClient(db_url)
+            self.client = get_mongo_client()
             self.db = self.client["policies"]
             self.collection = self.db["graphs"]
+            self.cache = get_metadata_cache("graphs", "graph_uri")
+            self.cache.ensure_watcher(self.collection)
         except Exception as e:
             raise RuntimeError(
                 f"Failed to initialize database connection: {e}")
@@ -204,14 +256,25 @@ class GraphsDB:
         try:
             graph_dict = graph.to_dict()
             self.collection.insert_one(graph_dict)
+            self.cache.invalidate(graph.graph_uri)
             return True
         except PyMongoError as e:
             print(f"Error creating graph: {e}")
             return False
 
+    def read_document(self, graph_uri: str) -> Optional[Dict]:
+        """The cached graph document, shared between callers and read-only."""
+        result = self.cache.get(graph_uri)
+        if result is None:
+            generation = self.cache.generation()
+            result = self.collection.find_one({"graph_uri": graph_uri})
+            if result:
+                self.cache.put(graph_uri, result, generation)
+        return result
+
     def read(self, graph_uri: str) -> Optional[Graph]:
         try:
-            result = self.collection.find_one({"graph_uri": graph_uri})
+            result = self.read_document(graph_uri)
             if result:
                 return Graph.from_dict(result)
             return None
@@ -225,6 +288,9 @@ class GraphsDB:
             result = self.collection.update_one(
                 {"graph_uri": graph_uri}, {"$set": updated_data}
             )
+            self.cache.invalidate(graph_uri)
+            if updated_graph.graph_uri != graph_uri:
+                self.cache.invalidate(updated_graph.graph_uri)
             return result.matched_count > 0
         except PyMongoError as e:
             print(f"Error updating graph: {e}")
@@ -233,6 +299,7 @@ class GraphsDB:
     def delete(self, graph_uri: str) -> bool:
         try:
             result = self.collection.delete_one({"graph_uri": graph_uri})
+            self.cache.invalidate(graph_uri)
             return result.deleted_count > 0
         except PyMongoError as e:
             print(f"Error deleting graph: {e}")
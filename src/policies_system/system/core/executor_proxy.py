@@ -1,25 +1,50 @@
 import requests
-from .db import PolicyDB, FunctionsDB
+
+from .db import PolicyDB, FunctionsDB, GraphsDB
 from .schema import PolicyRule, Graph, Function
-from .graph import GraphsDB, is_dag
+from .plan import is_dag
+from .sessions import get_session, get_timeout
+from .metrics import track_upstream
+from .health import circuit_breakers
+
+
+def handle_response(response):
+    """Unwraps an executor response; works for both requests and httpx responses."""
+    try:
+        response_data = response.json()
+    except ValueError:
+        response.raise_for_status()
+        raise Exception("Invalid JSON response from server")
+
+    if response_data.get("success"):
+        return response_data.get("data", response_data.get("message"))
+    else:
+        raise Exception(response_data.get(
+            "message", "Unknown error occurred"))
 
 
 class ExecutorProxyClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, executor_id=None):
         self.base_url = base_url.rstrip('/')
+        # label for the upstream metrics, falls back to the host when unknown
+        self.executor_id = executor_id or self.base_url
+        self.session = get_session(self.base_url)
+        self.timeout = get_timeout()
 
     def _handle_response(self, response):
-        try:
-            response_data = response.json()
-        except ValueError:
-            response.raise_for_status()
-            raise Exception("Invalid JSON response from server")
-
-        if response_data.get("success"):
-            return response_data.get("data", response_data.get("message"))
-        else:
-            raise Exception(response_data.get(
-                "message", "Unknown error occurred"))
+        return handle_response(response)
+
+    def _request(self, operation, method, url, **kwargs):
+        breaker = circuit_breakers.get(self.base_url)
+        with track_upstream(self.executor_id, operation), breaker.attempt():
+            try:
+                response = self.session.request(
+                    method, url, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException:
+                breaker.record_failure()
+                raise
+            breaker.record_status(response.status_code)
+            return self._handle_response(response)
 
     def execute_policy(self, policy_rule_uri, input_data, parameters=None):
         url = f"{self.base_url}/execute_policy"
@@ -28,8 +53,7 @@ class ExecutorProxyClient:
             "input_data": input_data,
             "parameters": parameters
         }
-        response = requests.post(url, json=payload)
-        return self._handle_response(response)
+        return self._request("execute_policy", "POST", url, json=payload)
 
     def create_deployment(self, name, policy_rule_uri, policy_rule_parameters=None, replicas=1, autoscaling=None, node_selector=""):
         url = f"{self.base_url}/deployments"
@@ -41,18 +65,15 @@ class ExecutorProxyClient:
             "autoscaling": autoscaling,
             "node_selector": node_selector
         }
-        response = requests.post(url, json=payload)
-        return self._handle_response(response)
+        return self._request("create_deployment", "POST", url, json=payload)
 
     def remove_deployment(self, name):
         url = f"{self.base_url}/deployments/{name}"
-        response = requests.delete(url)
-        return self._handle_response(response)
+        return self._request("remove_deployment", "DELETE", url)
 
     def call_function(self, name, input_data):
         url = f"{self.base_url}/call_function/{name}"
-        response = requests.post(url, json=input_data)
-        return self._handle_response(response)
+        return self._request("call_function", "POST", url, json=input_data)
 
     def create_job_with_estimate(self, name, policy_rule_uri, job_id, policy_rule_parameters=None, inputs=None):
         url = f"{self.base_url}/create_job_with_estimate"
@@ -63,15 +84,13 @@ class ExecutorProxyClient:
             "policy_rule_parameters": policy_rule_parameters,
             "inputs": inputs or {}
         }
-        response = requests.post(url, json=payload)
-        return self._handle_response(response)
+        return self._request("create_job_with_estimate", "POST", url, json=payload)
 
     def estimate_deployment(self, mode, policy):
         url = f"{self.base_url}/estimator/estimate"
         payload = {"mode": mode, "policy": policy} if mode == "adhoc" else {
             "mode": mode, "policy_rule_uri": policy}
-        response = requests.post(url, json=payload)
-        return self._handle_response(response)
+        return self._request("estimate_deployment", "POST", url, json=payload)
 
     def create_deployment_with_estimate(self, name, policy_rule_uri, policy_rule_parameters=None, replicas=1, autoscaling=None):
         url = f"{self.base_url}/deployments/deploy-with-estimate"
@@ -82,8 +101,7 @@ class ExecutorProxyClient:
             "replicas": replicas,
             "autoscaling": autoscaling
         }
-        response = requests.post(url, json=payload)
-        return self._handle_response(response)
+        return self._request("create_deployment_with_estimate", "POST", url, json=payload)
 
     def estimate_graph(self, policies):
         try:
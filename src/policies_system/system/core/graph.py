@@ -1,106 +1,244 @@
-from .schema import Graph, Function
-from .db import GraphsDB, FunctionsDB
-from .executor_proxy import ExecutorProxyClient
-from collections import defaultdict, deque
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .db import GraphsDB, FunctionsDB, FUNCTION_ROUTING_FIELDS
+from .routing import call_function_routed
+from .plan import GraphExecutionPlan, plan_cache
+from .memo import node_output_cache
+from .metrics import observe_node
+from collections import deque
 
 
-def is_dag(graph_connection_data: dict) -> bool:
+_node_pool = None
+_node_pool_lock = threading.Lock()
 
-    in_degree = defaultdict(int)
-    adjacency_list = defaultdict(list)
 
-    for src, targets in graph_connection_data.items():
-        for tgt in targets:
-            adjacency_list[src].append(tgt)
-            in_degree[tgt] += 1
-            if src not in in_degree:
-                in_degree[src] = 0
+def get_node_pool() -> ThreadPoolExecutor:
+    """Process-wide pool on which graph nodes of all running graphs are dispatched."""
+    global _node_pool
 
-    queue = deque([node for node in in_degree if in_degree[node] == 0])
-    visited_count = 0
+    if _node_pool is None:
+        with _node_pool_lock:
+            if _node_pool is None:
+                _node_pool = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("GRAPH_NODE_POOL_SIZE", "64")),
+                    thread_name_prefix="graph-node")
+    return _node_pool
 
-    while queue:
-        node = queue.popleft()
-        visited_count += 1
-        for neighbor in adjacency_list[node]:
-            in_degree[neighbor] -= 1
-            if in_degree[neighbor] == 0:
-                queue.append(neighbor)
 
-    return visited_count == len(in_degree)
+def resolve_max_concurrency(plan: GraphExecutionPlan, max_concurrency: int = None) -> int:
+    if max_concurrency:
+        return max(1, int(max_concurrency))
 
+    if plan.max_concurrency:
+        return max(1, plan.max_concurrency)
 
-def execute_graph(graph_uri: str, input_data: dict) -> dict:
+    return max(1, int(os.getenv("GRAPH_MAX_CONCURRENCY", "16")))
 
-    try:
-        graph = GraphsDB().read(graph_uri)
-        if not graph:
-            raise Exception(f"Graph with URI '{graph_uri}' not found.")
 
-        graph_connection_data = graph.graph_connection_data
-        graph_function_ids = graph.graph_function_ids
+def get_execution_plan(graph_uri: str) -> GraphExecutionPlan:
 
-        if not is_dag(graph_connection_data):
-            raise Exception(
-                "Graph is not a Directed Acyclic Graph (DAG). Execution stopped.")
+    document = GraphsDB().read_document(graph_uri)
+    if not document:
+        raise Exception(f"Graph with URI '{graph_uri}' not found.")
+
+    return plan_cache.get_or_compile(graph_uri, document)
 
-        all_nodes = set(graph_function_ids)
-        outgoing_nodes = set(
-            node for src in graph_connection_data for node in graph_connection_data[src])
-        leaf_nodes = list(all_nodes - outgoing_nodes)
 
-        if len(leaf_nodes) != 1:
+def call_node(plan: GraphExecutionPlan, function_id: str, inputs):
+
+    route = plan.endpoints.get(function_id)
+    if not route:
+        # not resolved up front, e.g. the function was invalidated mid-run
+        function = FunctionsDB().read(function_id)
+        if not function:
             raise Exception(
-                "Graph must have exactly one leaf node to produce a single final output.")
-        leaf_node = leaf_nodes[0]
-
-        in_degree = defaultdict(int)
-        adjacency_list = defaultdict(list)
-
-        for src, targets in graph_connection_data.items():
-            for tgt in targets:
-                adjacency_list[src].append(tgt)
-                in_degree[tgt] += 1
-                if src not in in_degree:
-                    in_degree[src] = 0
-
-        queue = deque(
-            [node for node in graph_function_ids if in_degree[node] == 0])
-        function_outputs = {}
-
-        while queue:
-            current_function_id = queue.popleft()
-
-            function = FunctionsDB().read(current_function_id)
-            if not function:
-                raise Exception(
-                    f"No function with ID '{current_function_id}' found.")
-
-            # Fetch executor URI
-            executor_host_uri = function.function_executor_uri
-            if not executor_host_uri:
-                raise Exception(
-                    f"Executor URI not specified for function '{current_function_id}'.")
-
-            client = ExecutorProxyClient(base_url=executor_host_uri)
-
-            inputs = []
-            for src, targets in graph_connection_data.items():
-                if current_function_id in targets:
-                    inputs.append(function_outputs.get(src, input_data))
-            if len(inputs) == 1:
-                inputs = inputs[0]
-
-            # Call the function
-            result = client.call_function(current_function_id, inputs)
-            function_outputs[current_function_id] = result
-
-            for neighbor in adjacency_list[current_function_id]:
-                in_degree[neighbor] -= 1
-                if in_degree[neighbor] == 0:
-                    queue.append(neighbor)
-
-        return function_outputs[leaf_node]
+                f"No function with ID '{function_id}' found.")
+
+        # Fetch executor URI
+        if not function.function_executor_uri:
+            raise Exception(
+                f"Executor URI not specified for function '{function_id}'.")
+        route = {field: getattr(function, field)
+                 for field in FUNCTION_ROUTING_FIELDS}
+        plan.endpoints[function_id] = route
+
+    ttl = node_output_cache.ttl_for(route)
+    if ttl:
+        key = node_output_cache.make_key(route, inputs)
+        hit, output = node_output_cache.get(key)
+        if hit:
+            return output
+
+    output = call_function_routed(route, function_id, inputs)
+
+    if ttl:
+        node_output_cache.put(key, output, ttl)
+    return output
+
+
+@dataclass
+class NodeResult:
+    function_id: str
+    output: object
+    latency: float
+    queue_wait: float = 0.0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    input_bytes: Optional[int] = None
+    output_bytes: Optional[int] = None
+
+
+def _payload_size(payload) -> int:
+    return len(json.dumps(payload, default=str))
+
+
+def _run_node(plan: GraphExecutionPlan, function_id: str, inputs):
+    started = time.perf_counter()
+    output = call_node(plan, function_id, inputs)
+    return output, started, time.perf_counter()
+
+
+def run_graph(plan: GraphExecutionPlan, input_data: dict, max_concurrency: int = None,
+              measure_payloads: bool = False) -> Iterator[NodeResult]:
+    """Runs the plan, dispatching every node whose inputs are ready concurrently.
+
+    Yields a NodeResult as each node completes. At most `max_concurrency` nodes
+    are in flight at a time. The first failing node aborts the run, as does
+    closing the generator, and siblings that have not started are cancelled.
+    Timings in the results are relative to the start of the run.
+    """
+
+    limit = resolve_max_concurrency(plan, max_concurrency)
+    pool = get_node_pool()
+
+    run_started = time.perf_counter()
+    in_degree = dict(plan.in_degree)
+    ready = deque(plan.roots)
+    ready_at = {node: run_started for node in plan.roots}
+    in_flight = {}
+    input_sizes = {}
+    function_outputs = {}
+
+    try:
+        while ready or in_flight:
+            while ready and len(in_flight) < limit:
+                current_function_id = ready.popleft()
+                inputs = plan.node_inputs(
+                    current_function_id, function_outputs, input_data)
+                if measure_payloads:
+                    input_sizes[current_function_id] = _payload_size(inputs)
+                future = pool.submit(
+                    _run_node, plan, current_function_id, inputs)
+                in_flight[future] = current_function_id
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                current_function_id = in_flight.pop(future)
+                output, started, finished = future.result()
+                function_outputs[current_function_id] = output
+
+                for neighbor in plan.successors.get(current_function_id, []):
+                    in_degree[neighbor] -= 1
+                    if in_degree[neighbor] == 0:
+                        ready.append(neighbor)
+                        ready_at[neighbor] = time.perf_counter()
+
+                result = NodeResult(
+                    function_id=current_function_id,
+                    output=output,
+                    latency=finished - started,
+                    queue_wait=started - ready_at[current_function_id],
+                    started_at=started - run_started,
+                    finished_at=finished - run_started,
+                    input_bytes=input_sizes.get(current_function_id),
+                    output_bytes=_payload_size(
+                        output) if measure_payloads else None,
+                )
+                observe_node(result.function_id, result.queue_wait, result.latency,
+                             result.input_bytes, result.output_bytes)
+                yield result
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def critical_path(plan: GraphExecutionPlan, results: Dict[str, NodeResult]) -> List[str]:
+    """Chain of nodes that gated the end of the run, walking back from the last one to finish."""
+    if not results:
+        return []
+
+    node = max(results.values(), key=lambda result: result.finished_at).function_id
+    path = [node]
+    while True:
+        predecessors = [results[src] for src in plan.predecessors.get(node, [])
+                        if src in results]
+        if not predecessors:
+            break
+        node = max(predecessors, key=lambda result: result.finished_at).function_id
+        path.append(node)
+    path.reverse()
+    return path
+
+
+def build_trace(plan: GraphExecutionPlan, results: Dict[str, NodeResult], total: float) -> dict:
+    path = critical_path(plan, results)
+    return {
+        "graph_uri": plan.graph_uri,
+        "total_ms": total * 1000,
+        "critical_path": path,
+        "critical_path_ms": results[path[-1]].finished_at * 1000 if path else 0.0,
+        "nodes": [
+            {
+                "function_id": result.function_id,
+                "queue_wait_ms": result.queue_wait * 1000,
+                "round_trip_ms": result.latency * 1000,
+                "started_at_ms": result.started_at * 1000,
+                "finished_at_ms": result.finished_at * 1000,
+                "input_bytes": result.input_bytes,
+                "output_bytes": result.output_bytes,
+            }
+            for result in results.values()
+        ],
+    }
+
+
+def execute_graph(graph_uri: str, input_data: dict, max_concurrency: int = None) -> dict:
+
+    try:
+        plan = get_execution_plan(graph_uri)
+        plan.resolve_endpoints(FunctionsDB())
+
+        function_outputs = {
+            result.function_id: result.output
+            for result in run_graph(plan, input_data, max_concurrency)
+        }
+
+        return function_outputs[plan.leaf_node]
+
+    except Exception as e:
+        raise Exception(f"Error executing graph: {str(e)}")
+
+
+def execute_graph_traced(graph_uri: str, input_data: dict, max_concurrency: int = None) -> Tuple[dict, dict]:
+    """Like execute_graph, but also returns per-node timings, payload sizes and the critical path."""
+
+    try:
+        plan = get_execution_plan(graph_uri)
+        plan.resolve_endpoints(FunctionsDB())
+
+        started = time.perf_counter()
+        results = {
+            result.function_id: result
+            for result in run_graph(plan, input_data, max_concurrency, measure_payloads=True)
+        }
+        trace = build_trace(plan, results, time.perf_counter() - started)
+
+        return results[plan.leaf_node].output, trace
 
     except Exception as e:
         raise Exception(f"Error executing graph: {str(e)}")
@@ -0,0 +1,219 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import requests
+
+from .metrics import EXECUTOR_CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+# upstream statuses that mean the executor itself is unavailable, as opposed
+# to the policy or function failing inside it
+UNAVAILABLE_STATUS_CODES = {502, 503, 504}
+
+
+class ExecutorUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Per executor breaker: closed, open after repeated failures, half open to probe.
+
+    While open, calls are rejected right away. After `reset_timeout` seconds a
+    single trial call is let through; its outcome closes or re-opens the breaker.
+    A trial that ends without an outcome, e.g. cancelled, is released so the
+    next call becomes the trial.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, uri: str, failure_threshold: int, reset_timeout: float):
+        self.uri = uri
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.info(f"Circuit for executor {self.uri} is now {state}")
+            self.state = state
+            EXECUTOR_CIRCUIT_STATE.labels(self.uri).set(
+                {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[state])
+
+    def _admit(self) -> Optional[int]:
+        """Raises ExecutorUnavailable when the call must not be attempted.
+
+        Returns the trial number when the call is the half open trial.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trials += 1
+                return self._trials
+        raise ExecutorUnavailable(
+            f"Executor {self.uri} is unavailable (circuit {self.state})")
+
+    def release_trial(self, trial: int):
+        """Lets another call be the trial when `trial` ended without an outcome."""
+        with self._lock:
+            if self._trial_in_flight and self._trials == trial:
+                self._trial_in_flight = False
+
+    @contextmanager
+    def attempt(self):
+        """Wraps one call to the executor, which records its outcome inside."""
+        trial = self._admit()
+        try:
+            yield
+        finally:
+            if trial is not None:
+                self.release_trial(trial)
+
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def record_status(self, status_code: int):
+        if status_code in UNAVAILABLE_STATUS_CODES:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+class CircuitBreakers:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, uri: str) -> CircuitBreaker:
+        uri = uri.rstrip("/")
+        breaker = self._breakers.get(uri)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(uri, CircuitBreaker(
+                    uri, self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def is_available(self, uri: str) -> bool:
+        breaker = self._breakers.get(uri.rstrip("/"))
+        return breaker is None or not breaker.is_open()
+
+
+circuit_breakers = CircuitBreakers(
+    failure_threshold=int(os.getenv("EXECUTOR_CIRCUIT_FAILURES", "5")),
+    reset_timeout=float(os.getenv("EXECUTOR_CIRCUIT_RESET_TIMEOUT", "30")))
+
+
+class HealthProber:
+    """Probes GET /health on every registered executor in the background.
+
+    Probe outcomes count towards the executor's circuit breaker like call
+    outcomes do, so the circuit opens after the breaker's failure threshold
+    and a successful probe closes it again. executor_status is written back
+    to the executors collection when an executor crosses
+    `unhealthy_threshold` consecutive failures or recovers,
+    so other replicas and the allocator helpers see the same view.
+    """
+
+    def __init__(self, interval: float, timeout: float, unhealthy_threshold: int):
+        self.interval = interval
+        self.timeout = timeout
+        self.unhealthy_threshold = unhealthy_threshold
+        self._failures: Dict[str, int] = {}
+        self._thread_pid = None
+        self._pool = None
+        # no retries, a probe that fails is the signal
+        self.session = requests.Session()
+
+    def start(self):
+        if self._thread_pid == os.getpid():
+            return
+        self._thread_pid = os.getpid()
+        self._pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("HEALTH_PROBE_WORKERS", "16")),
+            thread_name_prefix="health-probe")
+        threading.Thread(target=self._probe_loop, daemon=True).start()
+
+    def probe(self, uri: str) -> bool:
+        try:
+            response = self.session.get(
+                f"{uri.rstrip('/')}/health", timeout=self.timeout)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def probe_all(self):
+        # imported here, the inventory module depends on this one
+        from .inventory import cluster_inventory
+        from .db import ExecutorsDB
+
+        executors = [executor for executor in cluster_inventory.executors()
+                     if executor.executor_host_uri]
+        results = self._pool.map(
+            lambda executor: self.probe(executor.executor_host_uri), executors)
+
+        for executor, healthy in zip(executors, results):
+            breaker = circuit_breakers.get(executor.executor_host_uri)
+            if healthy:
+                self._failures[executor.executor_id] = 0
+                # a closed breaker keeps the failure count of recent calls
+                if breaker.state != CircuitBreaker.CLOSED:
+                    breaker.record_success()
+                status = "healthy"
+            else:
+                self._failures[executor.executor_id] = self._failures.get(
+                    executor.executor_id, 0) + 1
+                breaker.record_failure()
+                if self._failures[executor.executor_id] < self.unhealthy_threshold:
+                    continue
+                status = "unhealthy"
+
+            if executor.executor_status != status:
+                logger.warning(
+                    f"Executor {executor.executor_id} is now {status}")
+                ExecutorsDB().set_status(executor.executor_id, status)
+
+    def _probe_loop(self):
+        while True:
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error(f"Executor health probe failed: {e}")
+            time.sleep(self.interval)
+
+
+health_prober = HealthProber(
+    interval=float(os.getenv("HEALTH_PROBE_INTERVAL", "10")),
+    timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT", "2")),
+    unhealthy_threshold=int(os.getenv("HEALTH_UNHEALTHY_THRESHOLD", "2")))
@@ -0,0 +1,91 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+from .db import ExecutorsDB
+from .cache import get_metadata_cache
+from .schema import PolicyExecutors
+from .health import circuit_breakers
+
+logger = logging.getLogger(__name__)
+
+
+class ClusterInventory:
+    """In-memory snapshot of the executors collection used by the allocation helpers.
+
+    The snapshot is refreshed by a background thread every `refresh_interval`
+    seconds, and right away whenever an executor document is invalidated.
+    Readers never see a snapshot that is known to be stale, except while
+    MongoDB cannot be read: the previous snapshot is then kept until the
+    next successful refresh.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._executors: Optional[List[PolicyExecutors]] = None
+        self._stale = True
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread_pid = None
+
+    def refresh(self):
+        with self._lock:
+            # cleared before the scan so a concurrent invalidation is not lost
+            self._stale = False
+            try:
+                # not ExecutorsDB.query, it returns [] on errors
+                executors = [PolicyExecutors.from_dict(document)
+                             for document in ExecutorsDB().collection.find({})]
+            except PyMongoError as e:
+                logger.error(
+                    f"Failed to refresh cluster inventory, keeping the previous snapshot: {e}")
+                return
+            self._executors = executors
+        logger.debug(f"Cluster inventory refreshed with {len(executors)} executors")
+
+    def invalidate(self, executor_id: Optional[str] = None):
+        self._stale = True
+        self._wake.set()
+
+    def executors(self) -> List[PolicyExecutors]:
+        self._ensure_refresher()
+        if self._executors is None or self._stale:
+            self.refresh()
+        return self._executors if self._executors is not None else []
+
+    def executors_by_id(self) -> Dict[str, PolicyExecutors]:
+        return {executor.executor_id: executor for executor in self.executors()}
+
+    def healthy_executors(self) -> List[PolicyExecutors]:
+        """Executors marked healthy whose circuit is not open."""
+        return [executor for executor in self.executors()
+                if executor.executor_status == "healthy"
+                and circuit_breakers.is_available(executor.executor_host_uri or "")]
+
+    def cluster_ids(self) -> List[str]:
+        """Clusters offered to the resource allocator; unavailable executors are skipped."""
+        return [executor.executor_hardware_info['clusterId'] for executor in self.healthy_executors()]
+
+    def _ensure_refresher(self):
+        if self._thread_pid == os.getpid():
+            return
+        self._thread_pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh cluster inventory: {e}")
+
+
+cluster_inventory = ClusterInventory(
+    refresh_interval=float(os.getenv("CLUSTER_INVENTORY_REFRESH_INTERVAL", "30")))
+get_metadata_cache("executors", "executor_id").add_listener(
+    cluster_inventory.invalidate)
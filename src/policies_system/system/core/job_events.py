@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import redis
+
+from .jobs import PolicyJobsDB
+
+logger = logging.getLogger(__name__)
+
+FINAL_JOB_STATUSES = set(
+    os.getenv("JOB_FINAL_STATUSES", "completed,failed").split(","))
+
+
+def is_final(job: Optional[Dict]) -> bool:
+    return bool(job) and job.get("job_status") in FINAL_JOB_STATUSES
+
+
+class JobEventHub:
+    """Fans job status updates out to the requests waiting on them.
+
+    The executors' OutputListener publishes every job it writes to a Redis
+    channel. One subscriber thread per process reads the channel and hands
+    each update to the local waiters of that job. Waiters also re-read the
+    job every `recheck_interval` seconds and at their deadline, so an event
+    published before the subscription was live, or lost while Redis was
+    unreachable, does not leave them waiting.
+    """
+
+    def __init__(self, redis_url: str, channel: str, recheck_interval: float):
+        self.redis_url = redis_url
+        self.channel = channel
+        self.recheck_interval = recheck_interval
+        self._waiters: Dict[str, List[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def subscribe(self, job_id: str) -> queue.Queue:
+        self._ensure_subscriber()
+        waiter = queue.Queue()
+        with self._lock:
+            self._waiters.setdefault(job_id, []).append(waiter)
+        return waiter
+
+    def unsubscribe(self, job_id: str, waiter: queue.Queue):
+        with self._lock:
+            waiters = self._waiters.get(job_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._waiters.pop(job_id, None)
+
+    def dispatch(self, job: Dict):
+        with self._lock:
+            waiters = list(self._waiters.get(job.get("job_id"), []))
+        for waiter in waiters:
+            waiter.put(job)
+
+    def _ensure_subscriber(self):
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._listen, daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(self.redis_url).pubsub(
+                    ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                logger.info(f"Listening for job events on '{self.channel}'")
+                for message in pubsub.listen():
+                    try:
+                        self.dispatch(json.loads(message["data"]))
+                    except (TypeError, ValueError) as e:
+                        logger.warning(f"Ignoring malformed job event: {e}")
+            except redis.RedisError as e:
+                logger.error(f"Job event subscription failed, retrying: {e}")
+                time.sleep(1)
+
+    @staticmethod
+    def _read(job_id: str) -> Optional[Dict]:
+        job = PolicyJobsDB().read(job_id)
+        return job.to_dict() if job else None
+
+    def _next(self, waiter: queue.Queue, deadline: float) -> Optional[Dict]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        try:
+            return waiter.get(timeout=remaining)
+        except queue.Empty:
+            return None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Blocks until the job reaches a final status or `timeout` expires.
+
+        Returns the latest known state of the job, None if it was never seen.
+        """
+        waiter = self.subscribe(job_id)
+        try:
+            # read after subscribing so a completion in between is not missed
+            job = self._read(job_id)
+
+            deadline = time.monotonic() + timeout
+            while not is_final(job):
+                update = self._next(waiter, min(
+                    deadline, time.monotonic() + self.recheck_interval))
+                if update is not None:
+                    job = update
+                    continue
+                job = self._read(job_id) or job
+                if time.monotonic() >= deadline:
+                    break
+            return job
+        finally:
+            self.unsubscribe(job_id, waiter)
+
+    def stream(self, job_id: str, timeout: float, heartbeat: float) -> Iterator[Optional[Dict]]:
+        """Yields the current state and every update of the job until it is final.
+
+        None is yielded every `heartbeat` seconds without updates so callers
+        can keep the connection alive.
+        """
+        waiter = self.subscribe(job_id)
+        try:
+            job = self._read(job_id)
+            if job:
+                yield job
+
+            deadline = time.monotonic() + timeout
+            recheck_at = time.monotonic() + self.recheck_interval
+            heartbeat_at = time.monotonic() + heartbeat
+            while not is_final(job) and time.monotonic() < deadline:
+                update = self._next(waiter, min(deadline, recheck_at, heartbeat_at))
+                if update is None and time.monotonic() >= min(recheck_at, deadline):
+                    recheck_at = time.monotonic() + self.recheck_interval
+                    current = self._read(job_id)
+                    if current and current != job:
+                        update = current
+                if update is not None:
+                    job = update
+                elif time.monotonic() < heartbeat_at:
+                    continue
+                heartbeat_at = time.monotonic() + heartbeat
+                yield update
+        finally:
+            self.unsubscribe(job_id, waiter)
+
+
+job_event_hub = JobEventHub(
+    redis_url=os.getenv("JOB_EVENTS_REDIS_URL", "redis://localhost:6379/0"),
+    channel=os.getenv("JOB_EVENTS_CHANNEL", "JOB_EVENTS"),
+    recheck_interval=float(os.getenv("JOB_EVENTS_RECHECK_INTERVAL", "5")))
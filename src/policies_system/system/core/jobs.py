@@ -1,18 +1,23 @@
 import requests
 import logging
 
-import os
-import pymongo
 from pymongo.errors import PyMongoError
 from typing import Optional, List
 from dataclasses import dataclass, field, asdict
 from typing import Dict
 
+from .mongo import get_mongo_client
+from .sessions import get_session, get_timeout
+from .metrics import track_upstream
+
 
 class JobsSubmittorClient:
-    def __init__(self, api_url: str):
+    def __init__(self, api_url: str, executor_id: str = None):
         self.api_url = api_url.rstrip("/")
+        self.executor_id = executor_id or self.api_url
         self.create_job_endpoint = f"{self.api_url}/create_job"
+        self.session = get_session(self.api_url)
+        self.timeout = get_timeout()
 
     def submit_job(self, name: str, policy_rule_uri: str, job_id: str,
                    policy_rule_parameters: dict = None,
@@ -30,14 +35,37 @@ class JobsSubmittorClient:
 
         try:
             logging.info("Submitting job to create_job endpoint.")
-            response = requests.post(self.create_job_endpoint, json=payload)
-            response.raise_for_status()
+            with track_upstream(self.executor_id, "create_job"):
+                response = self.session.post(
+                    self.create_job_endpoint, json=payload, timeout=self.timeout)
+                response.raise_for_status()
             logging.info(f"Job '{name}' submitted successfully.")
             return response.json()
         except requests.exceptions.RequestException as e:
             logging.error(f"Error submitting job: {e}")
             return {"success": False, "message": str(e)}
 
+    def submit_jobs(self, jobs: list) -> dict:
+        """Submits many jobs in one request to the executor's bulk create_jobs endpoint.
+
+        Returns the per-job results in the order of `jobs`. Executors without
+        the bulk endpoint get the jobs one at a time.
+        """
+
+        try:
+            logging.info(f"Submitting {len(jobs)} jobs to create_jobs endpoint.")
+            with track_upstream(self.executor_id, "create_jobs"):
+                response = self.session.post(
+                    f"{self.api_url}/create_jobs", json={"jobs": jobs}, timeout=self.timeout)
+                if response.status_code != 404:
+                    response.raise_for_status()
+            if response.status_code == 404:
+                return {"success": True, "data": [self.submit_job(**job) for job in jobs]}
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error submitting jobs: {e}")
+            return {"success": False, "message": str(e)}
+
 
 @dataclass
 class PolicyJobs:
@@ -64,10 +92,7 @@ class PolicyJobs:
 class PolicyJobsDB:
     def __init__(self):
         try:
-            db_url = os.getenv("DB_URL", "mongodb://localhost:27017/policies")
-            if not db_url:
-                raise ValueError("Environment variable 'DB_URL' is not set.")
-            self.client = pymongo.MongoClient(db_url)
+            self.client = get_mongo_client()
             self.db = self.client["policies"]
             self.collection = self.db["policy_jobs"]
         except Exception as e:
@@ -1,10 +1,47 @@
 import logging
-from kubernetes import client, config
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from kubernetes import client, config, watch
+from kubernetes.client.rest import ApiException
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_api_clients: Dict[str, client.ApiClient] = {}
+_api_clients_lock = threading.Lock()
+
+
+def get_api_client(cluster_config: dict) -> client.ApiClient:
+    """Returns an API client for the kubeconfig, reused across initializers.
+
+    Clients are built with new_client_from_config_dict rather than loading the
+    kubeconfig into the global default configuration, so initializers for
+    different clusters can run concurrently.
+    """
+    key = hashlib.sha256(json.dumps(
+        cluster_config, sort_keys=True, default=str).encode()).hexdigest()
+
+    api_client = _api_clients.get(key)
+    if api_client is None:
+        with _api_clients_lock:
+            api_client = _api_clients.get(key)
+            if api_client is None:
+                api_client = config.new_client_from_config_dict(cluster_config)
+                _api_clients[key] = api_client
+    return api_client
+
+
+def _ignore_conflict(e: ApiException, what: str):
+    # re-running a partially failed rollout must not fail on what already exists
+    if e.status != 409:
+        raise e
+    logger.info(f"{what} already exists, keeping it.")
+
 
 class ExecutorInitializer:
     def __init__(self, cluster_config: dict, executor_id: str, max_processes: int):
@@ -18,16 +55,16 @@ class ExecutorInitializer:
         self.ambassador_mapping_name = f"executor-mapping-{executor_id}"
 
         try:
-            self._load_cluster_config(cluster_config)
-            self.apps_v1 = client.AppsV1Api()
-            self.core_v1 = client.CoreV1Api()
-            self.custom_api = client.CustomObjectsApi()
+            self.api_client = self._load_cluster_config(cluster_config)
+            self.apps_v1 = client.AppsV1Api(self.api_client)
+            self.core_v1 = client.CoreV1Api(self.api_client)
+            self.custom_api = client.CustomObjectsApi(self.api_client)
         except Exception as e:
             logger.error(f"Error loading cluster config: {e}")
             raise
 
     def _load_cluster_config(self, cluster_config):
-        config.load_kube_config_from_dict(cluster_config)
+        return get_api_client(cluster_config)
 
     def create_executor(self):
         try:
@@ -38,6 +75,30 @@ class ExecutorInitializer:
             logger.error(f"Error creating executor: {e}")
             raise
 
+    def wait_until_ready(self, timeout: int) -> bool:
+        """Watches the deployment until all its replicas are available, or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        w = watch.Watch()
+        try:
+            while time.monotonic() < deadline:
+                # the watch starts with the current state, so readiness reached
+                # before it was opened is seen too
+                for event in w.stream(
+                        self.apps_v1.list_namespaced_deployment,
+                        namespace=self.namespace,
+                        field_selector=f"metadata.name={self.deployment_name}",
+                        timeout_seconds=max(1, int(deadline - time.monotonic()))):
+                    deployment = event["object"]
+                    wanted = deployment.spec.replicas or 0
+                    available = (deployment.status.available_replicas or 0) if deployment.status else 0
+                    if event["type"] != "DELETED" and wanted and available >= wanted:
+                        logger.info(
+                            f"Deployment {self.deployment_name} is ready.")
+                        return True
+            return False
+        finally:
+            w.stop()
+
     def _create_deployment(self):
         try:
             env_vars = [
@@ -84,8 +145,11 @@ class ExecutorInitializer:
                 spec=spec
             )
 
-            self.apps_v1.create_namespaced_deployment(
-                namespace=self.namespace, body=deployment)
+            try:
+                self.apps_v1.create_namespaced_deployment(
+                    namespace=self.namespace, body=deployment)
+            except ApiException as e:
+                _ignore_conflict(e, f"Deployment {self.deployment_name}")
             logger.info(
                 f"Deployment {self.deployment_name} created successfully.")
         except Exception as e:
@@ -106,8 +170,11 @@ class ExecutorInitializer:
                 )
             )
 
-            self.core_v1.create_namespaced_service(
-                namespace=self.namespace, body=service)
+            try:
+                self.core_v1.create_namespaced_service(
+                    namespace=self.namespace, body=service)
+            except ApiException as e:
+                _ignore_conflict(e, f"Service {self.service_name}")
             logger.info(f"Service {self.service_name} created successfully.")
         except Exception as e:
             logger.error(f"Error creating service: {e}")
@@ -125,13 +192,17 @@ class ExecutorInitializer:
                 },
             }
 
-            self.custom_api.create_namespaced_custom_object(
-                group="getambassador.io",
-                version="v2",
-                namespace=self.namespace,
-                plural="mappings",
-                body=ambassador_mapping,
-            )
+            try:
+                self.custom_api.create_namespaced_custom_object(
+                    group="getambassador.io",
+                    version="v2",
+                    namespace=self.namespace,
+                    plural="mappings",
+                    body=ambassador_mapping,
+                )
+            except ApiException as e:
+                _ignore_conflict(
+                    e, f"Ambassador mapping {self.ambassador_mapping_name}")
             logger.info(
                 f"Ambassador mapping {self.ambassador_mapping_name} registered successfully.")
         except Exception as e:
@@ -161,3 +232,54 @@ class ExecutorInitializer:
         except Exception as e:
             logger.error(f"Error removing executor: {e}")
             raise
+
+
+def _provision_one(spec: dict, wait: bool, timeout: int) -> dict:
+    started = time.monotonic()
+    result = {"executor_id": spec.get("executor_id")}
+    try:
+        initializer = ExecutorInitializer(**spec)
+        initializer.create_executor()
+        result["ready"] = initializer.wait_until_ready(timeout) if wait else None
+        result["success"] = result["ready"] is not False
+        if result["ready"] is False:
+            result["message"] = f"Not ready after {timeout}s"
+    except Exception as e:
+        result["success"] = False
+        result["message"] = str(e)
+    result["elapsed"] = time.monotonic() - started
+    return result
+
+
+def _remove_one(spec: dict) -> dict:
+    result = {"executor_id": spec.get("executor_id")}
+    try:
+        ExecutorInitializer(**spec).remove_executor()
+        result["success"] = True
+    except Exception as e:
+        result["success"] = False
+        result["message"] = str(e)
+    return result
+
+
+def _run_bulk(fn, specs: List[dict]) -> List[dict]:
+    if not specs:
+        return []
+    workers = min(len(specs), int(os.getenv("EXECUTOR_PROVISION_WORKERS", "16")))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provision") as pool:
+        return list(pool.map(fn, specs))
+
+
+def provision_executors(specs: List[dict], wait: bool = True, timeout: int = None) -> List[dict]:
+    """Creates executors on many clusters concurrently.
+
+    Each spec holds the ExecutorInitializer arguments (cluster_config,
+    executor_id, max_processes). Returns one status per spec, in order; a
+    failure on one cluster does not affect the others.
+    """
+    timeout = timeout or int(os.getenv("EXECUTOR_READY_TIMEOUT", "300"))
+    return _run_bulk(lambda spec: _provision_one(spec, wait, timeout), specs)
+
+
+def remove_executors(specs: List[dict]) -> List[dict]:
+    return _run_bulk(_remove_one, specs)
@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class NodeOutputCache:
+    """Outputs of deterministic graph functions keyed by function, version and inputs.
+
+    Functions opt in through their function_metadata:
+
+        {"deterministic": true, "cache_ttl": 300, "version": "optional"}
+
+    The version defaults to function_policy_rule_uri, which already carries the
+    policy version. Outputs live in an in-process LRU and, when
+    NODE_OUTPUT_CACHE_REDIS_URL is set, also in Redis so they are shared
+    between API replicas.
+    """
+
+    def __init__(self, max_size: int, redis_url: str = None):
+        self.local = TTLCache(max_size=max_size, ttl=0)
+        self.redis = redis.Redis.from_url(redis_url) if redis_url else None
+
+    @staticmethod
+    def ttl_for(route: Dict) -> Optional[int]:
+        metadata = route.get("function_metadata") or {}
+        if not metadata.get("deterministic"):
+            return None
+        return int(metadata.get("cache_ttl", os.getenv("NODE_OUTPUT_CACHE_TTL", "300")))
+
+    @staticmethod
+    def make_key(route: Dict, inputs: Any) -> str:
+        metadata = route.get("function_metadata") or {}
+        version = metadata.get("version") or route.get(
+            "function_policy_rule_uri", "")
+        canonical = json.dumps(inputs, sort_keys=True,
+                               separators=(",", ":"), default=str)
+        digest = hashlib.sha256(canonical.encode()).hexdigest()
+        return f"node-output:{route['function_id']}:{version}:{digest}"
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self.local.get(key)
+        if entry is not None:
+            output, expires_at = entry
+            if expires_at > time.time():
+                return True, output
+            self.local.pop(key)
+
+        if self.redis is not None:
+            try:
+                value = self.redis.get(key)
+                if value is not None:
+                    output = json.loads(value)
+                    ttl = self.redis.ttl(key)
+                    if ttl > 0:
+                        self.local.put(key, (output, time.time() + ttl))
+                    return True, output
+            except redis.RedisError as e:
+                logger.error(f"Node output cache read from Redis failed: {e}")
+
+        return False, None
+
+    def put(self, key: str, output: Any, ttl: int):
+        self.local.put(key, (output, time.time() + ttl))
+
+        if self.redis is not None:
+            try:
+                self.redis.set(key, json.dumps(output), ex=ttl)
+            except (redis.RedisError, TypeError, ValueError) as e:
+                logger.error(f"Node output cache write to Redis failed: {e}")
+
+
+node_output_cache = NodeOutputCache(
+    max_size=int(os.getenv("NODE_OUTPUT_CACHE_SIZE", "10000")),
+    redis_url=os.getenv("NODE_OUTPUT_CACHE_REDIS_URL"),
+)
@@ -0,0 +1,159 @@
+import os
+import glob
+import time
+import tempfile
+from contextlib import contextmanager
+
+from prometheus_client import (Counter, Gauge, Histogram, CollectorRegistry,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+
+# prometheus_client picks its value storage when it is imported, this must be
+# read at the same time: with several ASGI workers every worker writes its
+# samples to PROMETHEUS_MULTIPROC_DIR and /metrics aggregates them
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+GRAPH_NODE_LATENCY = Histogram(
+    "graph_node_latency_seconds",
+    "Latency of graph nodes, split into time waiting for dispatch and executor round trip.",
+    ["function_id", "phase"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GRAPH_NODE_PAYLOAD_BYTES = Histogram(
+    "graph_node_payload_bytes",
+    "Size of graph node inputs and outputs, recorded for traced runs.",
+    ["function_id", "direction"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144,
+             1048576, 4194304, 16777216),
+)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Requests handled by the control plane API.",
+    ["route", "method", "status"],
+)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_latency_seconds",
+    "Latency of control plane API requests.",
+    ["route", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Control plane API requests currently being handled.",
+    multiprocess_mode="livesum",
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "executor_upstream_latency_seconds",
+    "Latency of calls made to policy executors.",
+    ["executor_id", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+UPSTREAM_ERRORS = Counter(
+    "executor_upstream_errors_total",
+    "Failed calls made to policy executors, including error responses.",
+    ["executor_id", "operation"],
+)
+
+MONGO_OP_LATENCY = Histogram(
+    "mongo_operation_latency_seconds",
+    "Latency of MongoDB commands issued by the control plane.",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+             0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+MONGO_OP_ERRORS = Counter(
+    "mongo_operation_errors_total",
+    "MongoDB commands that failed.",
+    ["collection", "command"],
+)
+
+ALLOCATOR_LATENCY = Histogram(
+    "allocator_latency_seconds",
+    "Latency of resource allocator calls.",
+    ["mode", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+HEDGED_REQUESTS = Counter(
+    "call_function_hedged_requests_total",
+    "Duplicate function calls sent after the hedging delay, and how many of them won.",
+    ["function_id", "outcome"],
+)
+
+EXECUTOR_CIRCUIT_STATE = Gauge(
+    "executor_circuit_state",
+    "Circuit breaker state per executor: 0 closed, 1 half open, 2 open.",
+    ["executor_uri"],
+    multiprocess_mode="livemax",
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "mongo_pool_connections",
+    "Connections of the shared MongoDB clients, by client (pymongo, motor) and state.",
+    ["client", "state"],
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def track_upstream(executor_id: str, operation: str):
+    """Times an executor call; exceptions raised inside the block count as errors."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(executor_id, operation).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(executor_id, operation).observe(
+            time.perf_counter() - started)
+
+
+def observe_node(function_id: str, queue_wait: float, round_trip: float,
+                 input_bytes: int = None, output_bytes: int = None):
+    GRAPH_NODE_LATENCY.labels(function_id, "queue_wait").observe(queue_wait)
+    GRAPH_NODE_LATENCY.labels(function_id, "round_trip").observe(round_trip)
+    if input_bytes is not None:
+        GRAPH_NODE_PAYLOAD_BYTES.labels(
+            function_id, "input").observe(input_bytes)
+    if output_bytes is not None:
+        GRAPH_NODE_PAYLOAD_BYTES.labels(
+            function_id, "output").observe(output_bytes)
+
+
+def observe_request(route: str, method: str, status: int, latency: float):
+    HTTP_REQUESTS.labels(route, method, str(status)).inc()
+    HTTP_REQUEST_LATENCY.labels(route, method).observe(latency)
+
+
+def prepare_multiprocess_metrics(workers: int):
+    """Points the worker processes about to be started at a shared metrics directory.
+
+    Must run before the workers import prometheus_client. Samples left by
+    a previous run are removed.
+    """
+    if workers <= 1:
+        return
+    directory = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="prometheus-"))
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+def render_metrics():
+    if not MULTIPROCESS:
+        return generate_latest(), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
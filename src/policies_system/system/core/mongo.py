@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+import logging
+from typing import Dict
+
+import pymongo
+from pymongo import monitoring
+
+from .metrics import MONGO_OP_LATENCY, MONGO_OP_ERRORS, DB_POOL_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Tracks connection checkouts of one shared client so the pool can be sized."""
+
+    def __init__(self, client: str):
+        self.client = client
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.total_checkouts = 0
+        self.failed_checkouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _publish(self):
+        # set on every change rather than with set_function, which
+        # multiprocess mode does not support
+        DB_POOL_CONNECTIONS.labels(self.client, "open").set(self.open_connections)
+        DB_POOL_CONNECTIONS.labels(self.client, "checked_out").set(self.checked_out)
+
+    def _record_wait(self):
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        if started is None:
+            return 0.0
+        return time.perf_counter() - started
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_time = self._record_wait()
+        with self._lock:
+            self.checked_out += 1
+            self.total_checkouts += 1
+            self.total_wait_time += wait_time
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            self._publish()
+
+    def connection_check_out_failed(self, event):
+        wait_time = self._record_wait()
+        with self._lock:
+            self.failed_checkouts += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+            self._publish()
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+            self._publish()
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+            self._publish()
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            completed = self.total_checkouts + self.failed_checkouts
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "total_checkouts": self.total_checkouts,
+                "failed_checkouts": self.failed_checkouts,
+                "avg_wait_time_ms": (self.total_wait_time / completed * 1000) if completed else 0.0,
+                "max_wait_time_ms": self.max_wait_time * 1000,
+            }
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Records the latency of every command sent by the shared client, per collection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections: Dict[int, str] = {}
+
+    @staticmethod
+    def _collection_of(event) -> str:
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        return target if isinstance(target, str) else "none"
+
+    def started(self, event):
+        with self._lock:
+            self._collections[event.request_id] = self._collection_of(event)
+
+    def _finish(self, event) -> str:
+        with self._lock:
+            collection = self._collections.pop(event.request_id, "none")
+        MONGO_OP_LATENCY.labels(collection, event.command_name).observe(
+            event.duration_micros / 1e6)
+        return collection
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        MONGO_OP_ERRORS.labels(collection, event.command_name).inc()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+pool_metrics = PoolMetricsListener("pymongo")
+async_pool_metrics = PoolMetricsListener("motor")
+command_metrics = CommandMetricsListener()
+
+
+def get_client_options() -> Dict:
+    return {
+        "maxPoolSize": int(os.getenv("DB_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("DB_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("DB_MAX_IDLE_TIME_MS", "300000")),
+        "waitQueueTimeoutMS": int(os.getenv("DB_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+        "connectTimeoutMS": int(os.getenv("DB_CONNECT_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("DB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("DB_SOCKET_TIMEOUT_MS", "30000")),
+        "readPreference": os.getenv("DB_READ_PREFERENCE", "primary"),
+    }
+
+
+def get_mongo_client() -> pymongo.MongoClient:
+    """Returns the process-wide MongoClient, creating it on first use.
+
+    The client is recreated after a fork since pymongo clients are not fork-safe.
+    """
+    global _client, _client_pid
+
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            db_url = os.getenv("DB_URL", "mongodb://localhost:27017/policies")
+            if not db_url:
+                raise ValueError("Environment variable 'DB_URL' is not set.")
+            options = get_client_options()
+            _client = pymongo.MongoClient(
+                db_url, event_listeners=[pool_metrics, command_metrics], **options)
+            _client_pid = os.getpid()
+            logger.info(
+                f"Created shared MongoDB client with options: {options}")
+    return _client
+
+
+def get_pool_metrics() -> Dict:
+    metrics = pool_metrics.snapshot()
+    metrics["async"] = async_pool_metrics.snapshot()
+    metrics["options"] = get_client_options()
+    return metrics
+
+
+def set_mongo_client(client: pymongo.MongoClient):
+    """Replaces the shared client of this process, e.g. with mongomock for local benchmarks."""
+    global _client, _client_pid
+
+    with _client_lock:
+        _client = client
+        _client_pid = os.getpid()
@@ -0,0 +1,206 @@
+import os
+import time
+import logging
+from dataclasses import dataclass, field
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+from .schema import Graph
+from .cache import TTLCache, get_metadata_cache
+
+logger = logging.getLogger(__name__)
+
+# routes are read straight from the functions collection, re-read them after
+# this many seconds so a moved function is picked up without an invalidation
+ENDPOINTS_TTL = float(os.getenv("GRAPH_ENDPOINTS_TTL", "10"))
+
+
+def is_dag(graph_connection_data: dict) -> bool:
+
+    in_degree = defaultdict(int)
+    adjacency_list = defaultdict(list)
+
+    for src, targets in graph_connection_data.items():
+        for tgt in targets:
+            adjacency_list[src].append(tgt)
+            in_degree[tgt] += 1
+            if src not in in_degree:
+                in_degree[src] = 0
+
+    queue = deque([node for node in in_degree if in_degree[node] == 0])
+    visited_count = 0
+
+    while queue:
+        node = queue.popleft()
+        visited_count += 1
+        for neighbor in adjacency_list[node]:
+            in_degree[neighbor] -= 1
+            if in_degree[neighbor] == 0:
+                queue.append(neighbor)
+
+    return visited_count == len(in_degree)
+
+
+@dataclass
+class GraphExecutionPlan:
+    graph_uri: str
+    graph_version: str
+    roots: List[str]
+    levels: List[List[str]]
+    predecessors: Dict[str, List[str]]
+    successors: Dict[str, List[str]]
+    in_degree: Dict[str, int]
+    leaf_node: str
+    max_concurrency: Optional[int] = None
+    # the cached graph document the plan was compiled from
+    source: Optional[Dict] = field(default=None, repr=False, compare=False)
+    endpoints: Dict[str, Dict] = field(default_factory=dict)
+    endpoints_expire_at: float = 0.0
+
+    def node_inputs(self, function_id: str, function_outputs: dict, input_data: dict):
+        predecessors = self.predecessors.get(function_id)
+        if not predecessors:
+            # the roots are called with the input of the graph
+            return input_data
+        inputs = [function_outputs.get(src, input_data) for src in predecessors]
+        if len(inputs) == 1:
+            inputs = inputs[0]
+        return inputs
+
+    def unresolved_endpoints(self) -> List[str]:
+        """Nodes whose route must be read, all of them once the routes are older than ENDPOINTS_TTL."""
+        if time.monotonic() >= self.endpoints_expire_at:
+            return list(self.in_degree)
+        return [function_id for function_id in self.in_degree
+                if function_id not in self.endpoints]
+
+    def set_endpoints(self, function_ids: List[str], routes: Dict[str, Dict]):
+        endpoints = {function_id: route for function_id, route in self.endpoints.items()
+                     if function_id not in function_ids}
+        for function_id, route in routes.items():
+            if route.get("function_executor_uri"):
+                endpoints[function_id] = route
+        if set(function_ids) >= set(self.in_degree):
+            self.endpoints_expire_at = time.monotonic() + ENDPOINTS_TTL
+        # swapped in whole, running executions keep a consistent view
+        self.endpoints = endpoints
+
+    def resolve_endpoints(self, functions_db):
+        """Resolves the routing fields of all unresolved nodes with a single query."""
+        missing = self.unresolved_endpoints()
+        if not missing:
+            return
+        routes = functions_db.read_routes(missing)
+        if routes is not None:
+            self.set_endpoints(missing, routes)
+
+
+def compile_plan(graph: Graph) -> GraphExecutionPlan:
+    """Validates the graph once and precomputes everything execute_graph needs."""
+
+    graph_connection_data = graph.graph_connection_data
+    graph_function_ids = graph.graph_function_ids
+
+    if not is_dag(graph_connection_data):
+        raise Exception(
+            "Graph is not a Directed Acyclic Graph (DAG). Execution stopped.")
+
+    # the final output is that of the one node no edge leaves
+    leaf_nodes = [node for node in dict.fromkeys(graph_function_ids)
+                  if not graph_connection_data.get(node)]
+
+    if len(leaf_nodes) != 1:
+        raise Exception(
+            "Graph must have exactly one leaf node to produce a single final output.")
+
+    in_degree = defaultdict(int)
+    successors = defaultdict(list)
+    predecessors = defaultdict(list)
+
+    for src, targets in graph_connection_data.items():
+        for tgt in targets:
+            successors[src].append(tgt)
+            in_degree[tgt] += 1
+            if src not in in_degree:
+                in_degree[src] = 0
+        for tgt in dict.fromkeys(targets):
+            predecessors[tgt].append(src)
+
+    roots = [node for node in graph_function_ids if in_degree[node] == 0]
+
+    # only nodes reachable from the roots are ever executed
+    remaining = dict(in_degree)
+    levels = []
+    level = list(roots)
+    while level:
+        levels.append(level)
+        next_level = []
+        for node in level:
+            for neighbor in successors[node]:
+                remaining[neighbor] -= 1
+                if remaining[neighbor] == 0:
+                    next_level.append(neighbor)
+        level = next_level
+
+    max_concurrency = None
+    if isinstance(graph.graph_metadata, dict) and graph.graph_metadata.get("max_concurrency"):
+        max_concurrency = int(graph.graph_metadata["max_concurrency"])
+
+    return GraphExecutionPlan(
+        graph_uri=graph.graph_uri,
+        graph_version=graph.graph_version,
+        roots=roots,
+        levels=levels,
+        predecessors=dict(predecessors),
+        successors=dict(successors),
+        in_degree=dict(in_degree),
+        leaf_node=leaf_nodes[0],
+        max_concurrency=max_concurrency,
+    )
+
+
+class PlanCache:
+    """Compiled plans keyed by graph_uri, at most `max_size` of them.
+
+    Plans are dropped when their graph document is invalidated and their
+    resolved endpoints are dropped when a function document is invalidated.
+    A cached plan is only reused for the very document object it was
+    compiled from: the metadata cache hands out the same object until the
+    document is re-read, so a graph changed in place without an
+    invalidation reaching this process is recompiled once its cache entry
+    expires.
+    """
+
+    def __init__(self, max_size: int):
+        self._plans = TTLCache(max_size=max_size, ttl=0)
+
+    def get(self, graph_uri: str) -> Optional[GraphExecutionPlan]:
+        return self._plans.get(graph_uri)
+
+    def get_or_compile(self, graph_uri: str, document: Dict) -> GraphExecutionPlan:
+        plan = self.get(graph_uri)
+        if plan is None or plan.source is not document:
+            plan = compile_plan(Graph.from_dict(document))
+            plan.source = document
+            self._plans.put(graph_uri, plan)
+        return plan
+
+    def invalidate_graph(self, graph_uri: Optional[str] = None):
+        if graph_uri is None:
+            self._plans.clear()
+        else:
+            self._plans.pop(graph_uri)
+
+    def invalidate_function(self, function_id: Optional[str] = None):
+        for plan in self._plans.values():
+            if function_id is None:
+                plan.endpoints.clear()
+            else:
+                plan.endpoints.pop(function_id, None)
+
+
+plan_cache = PlanCache(max_size=int(os.getenv("PLAN_CACHE_SIZE", "1024")))
+get_metadata_cache("graphs", "graph_uri").add_listener(
+    plan_cache.invalidate_graph)
+get_metadata_cache("functions", "function_id").add_listener(
+    plan_cache.invalidate_function)
@@ -0,0 +1,110 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# fields left out of paginated and streamed listings unless asked for,
+# they dominate the size of the documents
+HEAVY_FIELDS = {
+    "policies": ["code"],
+    "functions": ["function_policy_data"],
+}
+
+
+def _split(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+@dataclass
+class QueryOptions:
+    """Listing options of the /query endpoints, read from the query string.
+
+    ?fields=a,b     only return these fields
+    ?exclude=a,b    return everything but these fields
+    ?limit=100      page size; the response carries next_cursor
+    ?cursor=<id>    continue after the last document of the previous page
+    ?format=ndjson  stream one document per line instead of a JSON array
+    """
+
+    fields: Optional[List[str]] = None
+    exclude: Optional[List[str]] = None
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    stream: bool = False
+    heavy_fields: List[str] = field(default_factory=list)
+
+    @staticmethod
+    def from_args(args, collection_name: str) -> 'QueryOptions':
+        limit = args.get("limit")
+        if limit is not None:
+            limit = int(limit)
+            if limit <= 0:
+                raise ValueError("'limit' must be a positive integer.")
+            limit = min(limit, int(os.getenv("QUERY_MAX_PAGE_SIZE", "1000")))
+
+        options = QueryOptions(
+            fields=_split(args.get("fields")),
+            exclude=_split(args.get("exclude")),
+            limit=limit,
+            cursor=args.get("cursor"),
+            stream=args.get("format", "json").lower() == "ndjson",
+            heavy_fields=HEAVY_FIELDS.get(collection_name, []),
+        )
+        if options.fields is not None and options.exclude is not None:
+            raise ValueError("'fields' and 'exclude' cannot be combined.")
+        return options
+
+    @property
+    def is_plain(self) -> bool:
+        """True when no option was given, the endpoint then answers as it always has."""
+        return (self.fields is None and self.exclude is None and self.limit is None
+                and self.cursor is None and not self.stream)
+
+    def projection(self) -> Optional[Dict]:
+        if self.fields is not None:
+            return {name: 1 for name in self.fields}
+        exclude = self.exclude
+        if exclude is None and (self.limit is not None or self.stream):
+            exclude = self.heavy_fields
+        if exclude:
+            return {name: 0 for name in exclude if name != "_id"}
+        return None
+
+    def filter(self, query_filter: Dict) -> Dict:
+        if self.cursor is None:
+            return query_filter
+        try:
+            after = ObjectId(self.cursor)
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid 'cursor'.")
+        return {"$and": [query_filter, {"_id": {"$gt": after}}]}
+
+
+class DocumentPage:
+    """Iterates a query lazily; next_cursor is known once iteration is done."""
+
+    def __init__(self, collection, query_filter: Dict, options: QueryOptions):
+        self.options = options
+        self.returned = 0
+        self.last_id = None
+        self._cursor = collection.find(
+            options.filter(query_filter), options.projection()
+        ).sort("_id", 1).batch_size(int(os.getenv("QUERY_BATCH_SIZE", "500")))
+        if options.limit is not None:
+            self._cursor = self._cursor.limit(options.limit)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for document in self._cursor:
+            self.last_id = document.pop("_id", None)
+            self.returned += 1
+            yield document
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if self.options.limit is None or self.returned < self.options.limit or self.last_id is None:
+            return None
+        return str(self.last_id)
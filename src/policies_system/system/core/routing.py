@@ -0,0 +1,171 @@
+import os
+import time
+import random
+import threading
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .executor_proxy import ExecutorProxyClient
+from .metrics import HEDGED_REQUESTS
+from .health import circuit_breakers
+
+
+class OutstandingRequests:
+    """In-flight requests per executor URI, used to pick the least loaded target."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def track(self, uri: str):
+        with self._lock:
+            self._counts[uri] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._counts[uri] -= 1
+
+    def pick(self, targets: List[str], exclude: Optional[List[str]] = None) -> str:
+        candidates = [uri for uri in targets if uri not in (exclude or [])] or targets
+        # targets with an open circuit are only used when nothing else is left,
+        # the call then fails fast in the proxy client
+        candidates = [uri for uri in candidates
+                      if circuit_breakers.is_available(uri)] or candidates
+        with self._lock:
+            least = min(self._counts[uri] for uri in candidates)
+            return random.choice([uri for uri in candidates if self._counts[uri] == least])
+
+
+class LatencyWindow:
+    """Recent successful call latencies per function, for the hedging delay."""
+
+    def __init__(self, size: int, min_samples: int):
+        self.size = size
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, function_id: str, latency: float):
+        with self._lock:
+            samples = self._samples.get(function_id)
+            if samples is None:
+                samples = self._samples[function_id] = deque(maxlen=self.size)
+            samples.append(latency)
+
+    def percentile(self, function_id: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(function_id, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+outstanding = OutstandingRequests()
+latency_window = LatencyWindow(
+    size=int(os.getenv("HEDGE_WINDOW_SIZE", "200")),
+    min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")))
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+
+    if _hedge_pool is None:
+        with _hedge_pool_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("HEDGE_POOL_SIZE", "64")),
+                    thread_name_prefix="hedge")
+    return _hedge_pool
+
+
+def route_targets(route: Dict) -> List[str]:
+    """Executor URIs a function can be called on, primary first."""
+    targets = [route["function_executor_uri"]]
+    for uri in route.get("function_replica_uris") or []:
+        if uri and uri not in targets:
+            targets.append(uri)
+    return targets
+
+
+def hedge_delay(route: Dict) -> Optional[float]:
+    """Seconds to wait before sending a duplicate, or None when the function is not hedged.
+
+    Hedging is opt-in since the duplicate runs the function twice. Enable it
+    per function with function_metadata {"hedge": true, "hedge_percentile": 95}
+    or for all functions with CALL_FUNCTION_HEDGING=true.
+    """
+    metadata = route.get("function_metadata") or {}
+    enabled = metadata.get(
+        "hedge", os.getenv("CALL_FUNCTION_HEDGING", "false").lower() == "true")
+    if not enabled:
+        return None
+
+    pct = float(metadata.get("hedge_percentile",
+                             os.getenv("HEDGE_PERCENTILE", "95")))
+    delay = latency_window.percentile(route["function_id"], pct)
+    if delay is None:
+        return None
+    return max(delay, float(os.getenv("HEDGE_MIN_DELAY_MS", "10")) / 1000)
+
+
+def executor_id_for(route: Dict, uri: str) -> str:
+    return route.get("function_executor_id") if uri == route["function_executor_uri"] else uri
+
+
+def _attempt(route: Dict, uri: str, function_id: str, inputs):
+    with outstanding.track(uri):
+        started = time.perf_counter()
+        client = ExecutorProxyClient(
+            base_url=uri, executor_id=executor_id_for(route, uri))
+        output = client.call_function(function_id, inputs)
+        latency_window.record(function_id, time.perf_counter() - started)
+        return output
+
+
+def call_function_routed(route: Dict, function_id: str, inputs):
+    """Calls a function on its least loaded target, hedging when it is slow.
+
+    When hedging is enabled and the first call has not returned after the
+    configured latency percentile, or fails before that, a duplicate goes to
+    the least loaded other target (the same URI, i.e. another pod behind the
+    service, for functions without replicas). The first success wins; the
+    slower call is left to finish and its result is dropped.
+    """
+
+    targets = route_targets(route)
+    delay = hedge_delay(route)
+    primary = outstanding.pick(targets)
+
+    if delay is None:
+        return _attempt(route, primary, function_id, inputs)
+
+    pool = get_hedge_pool()
+    primary_future = pool.submit(_attempt, route, primary, function_id, inputs)
+    pending = {primary_future}
+    hedge_future = None
+
+    done, _ = wait(pending, timeout=delay)
+    if not done or primary_future.exception() is not None:
+        secondary = outstanding.pick(targets, exclude=[primary])
+        hedge_future = pool.submit(
+            _attempt, route, secondary, function_id, inputs)
+        pending.add(hedge_future)
+        HEDGED_REQUESTS.labels(function_id, "sent").inc()
+
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge_future:
+                    HEDGED_REQUESTS.labels(function_id, "won").inc()
+                return future.result()
+            error = future.exception()
+    raise error
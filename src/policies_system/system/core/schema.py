@@ -81,6 +81,7 @@ class Function:
     function_tags: List[str]
     function_policy_rule_uri: str
     function_policy_data: Dict
+    function_replica_uris: List[str] = field(default_factory=list)
 
     @staticmethod
     def from_dict(data: Dict) -> 'Function':
@@ -92,6 +93,7 @@ class Function:
             function_tags=data['function_tags'],
             function_policy_rule_uri=data['function_policy_rule_uri'],
             function_policy_data=data['function_policy_data'],
+            function_replica_uris=data.get('function_replica_uris', []),
         )
 
     def to_dict(self) -> Dict:
@@ -0,0 +1,59 @@
+import os
+import threading
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# POST is left out on purpose: executing a policy or a function twice is not safe.
+# Connection failures are still retried for every method since nothing was sent.
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_timeout() -> Tuple[float, float]:
+    return (
+        float(os.getenv("EXECUTOR_CONNECT_TIMEOUT", "3")),
+        float(os.getenv("EXECUTOR_READ_TIMEOUT", "300")),
+    )
+
+
+def _build_session() -> requests.Session:
+    retries = int(os.getenv("EXECUTOR_MAX_RETRIES", "3"))
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=float(os.getenv("EXECUTOR_RETRY_BACKOFF", "0.2")),
+        status_forcelist=(502, 503, 504),
+        allowed_methods=IDEMPOTENT_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=int(os.getenv("EXECUTOR_POOL_CONNECTIONS", "4")),
+        pool_maxsize=int(os.getenv("EXECUTOR_POOL_MAXSIZE", "64")),
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(base_url: str) -> requests.Session:
+    """Returns the keep-alive session shared by all clients of one executor host."""
+    key = base_url.rstrip('/')
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = _build_session()
+        return _sessions[key]
@@ -1,4 +1,10 @@
+import os
+
 from core.apis import run_app
+from core.async_apis import run_async_app
 
 if __name__ == "__main__":
-    run_app()
+    if os.getenv("SERVER_MODE", "wsgi").lower() == "asgi":
+        run_async_app()
+    else:
+        run_app()
@@ -0,0 +1,93 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from benchmarks.run import BenchmarkEnvironment
+
+
+@pytest.fixture(scope="module")
+def env():
+    # the benchmark harness: mongomock, fake executors and the Flask app on a free port
+    environment = BenchmarkEnvironment(SimpleNamespace(
+        db_url=None, latency="constant:ms=5", executors=2))
+    yield environment
+    environment.close()
+
+
+def call_output(function_id, inputs):
+    """What the fake executor answers for a call of the function."""
+    return {"path": f"/call_function/{function_id}", "input": inputs}
+
+
+def post(env, path, payload):
+    response = requests.post(f"{env.base_url}{path}", json=payload, timeout=10)
+    return response.status_code, response.json()
+
+
+def test_call_function(env):
+    function_id, = env.create_functions("api-call", 1)
+
+    status, body = post(env, f"/function/call_function/{function_id}", {"x": 1})
+    assert status == 200
+    assert body == {"success": True, "data": call_output(function_id, {"x": 1})}
+
+
+def test_execute_graph_returns_output_of_last_node(env):
+    source, left, right, sink = env.create_functions("api-wide", 4)
+    graph_uri = env.create_graph("api-wide", [source, left, right, sink], {
+        source: [left, right], left: [sink], right: [sink]})
+
+    status, body = post(env, "/graph/execute_graph",
+                        {"graph_uri": graph_uri, "input_data": {"x": 1}})
+    assert status == 200, body
+    first = call_output(source, {"x": 1})
+    assert body["data"] == call_output(
+        sink, [call_output(left, first), call_output(right, first)])
+
+
+def test_execute_graph_stream(env):
+    function_ids = env.create_functions("api-stream", 3)
+    graph_uri = env.create_graph("api-stream", function_ids, {
+        function_ids[0]: [function_ids[1]], function_ids[1]: [function_ids[2]]})
+
+    response = requests.post(f"{env.base_url}/graph/execute_graph/stream", json={
+        "graph_uri": graph_uri, "input_data": {"x": 1}}, timeout=10)
+    events = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [event.get("function_id") for event in events[:-1]] == function_ids
+    assert events[-1]["event"] == "result"
+    assert events[-1]["data"] == events[-2]["output"]
+
+
+def test_updated_graph_is_recompiled(env):
+    function_ids = env.create_functions("api-update", 3)
+    graph_uri = env.create_graph("api-update", function_ids[:2], {
+        function_ids[0]: [function_ids[1]]})
+    status, body = post(env, "/graph/execute_graph",
+                        {"graph_uri": graph_uri, "input_data": {"x": 1}})
+    assert body["data"]["path"] == f"/call_function/{function_ids[1]}"
+
+    document = env.graphs_db.read(graph_uri).to_dict()
+    document["graph_function_ids"] = function_ids
+    document["graph_connection_data"] = {
+        function_ids[0]: [function_ids[1]], function_ids[1]: [function_ids[2]]}
+    response = requests.put(f"{env.base_url}/graphs/{graph_uri}", json=document, timeout=10)
+    assert response.status_code == 200
+
+    status, body = post(env, "/graph/execute_graph",
+                        {"graph_uri": graph_uri, "input_data": {"x": 1}})
+    assert body["data"]["path"] == f"/call_function/{function_ids[2]}"
+
+
+def test_execute_graph_reports_failing_node(env):
+    function_id, = env.create_functions("api-missing", 1)
+    graph_uri = env.create_graph("api-missing", [function_id, "api-unknown"], {
+        function_id: ["api-unknown"]})
+
+    status, body = post(env, "/graph/execute_graph",
+                        {"graph_uri": graph_uri, "input_data": {"x": 1}})
+    assert status == 500
+    assert body["success"] is False
+    assert "api-unknown" in body["message"]
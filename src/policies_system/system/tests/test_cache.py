@@ -0,0 +1,143 @@
+import time
+
+from core.cache import MetadataCache, TTLCache
+
+
+def make_cache(max_size=16, ttl=60.0):
+    return MetadataCache("documents", "key", max_size=max_size, ttl=ttl,
+                         poll_interval=1.0)
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    evicted = []
+    cache = TTLCache(max_size=2, ttl=60,
+                     on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.keys() == ["a", "c"]
+    assert evicted == ["b"]
+
+
+def test_ttl_cache_expires_entries():
+    evicted = []
+    cache = TTLCache(max_size=2, ttl=0.05,
+                     on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", 1)
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    assert evicted == ["a"]
+    assert len(cache) == 0
+
+
+def test_ttl_cache_without_ttl_keeps_entries():
+    cache = TTLCache(max_size=2, ttl=0)
+    cache.put("a", 1)
+    time.sleep(0.01)
+    assert cache.get("a") == 1
+
+
+def test_ttl_cache_replacing_value_evicts_previous():
+    evicted = []
+    cache = TTLCache(max_size=2, ttl=60,
+                     on_evict=lambda key, value: evicted.append(value))
+    value = {"v": 1}
+    cache.put("a", value)
+    cache.put("a", value)
+    assert evicted == []
+    cache.put("a", {"v": 2})
+    assert evicted == [value]
+
+
+def test_put_after_invalidation_is_dropped():
+    cache = make_cache()
+    # a reader takes the generation, then a write invalidates the key
+    # before the reader's query result is cached
+    generation = cache.generation()
+    cache.invalidate("a")
+    cache.put("a", {"key": "a", "value": "stale"}, generation)
+    assert cache.get("a") is None
+
+    generation = cache.generation()
+    cache.put("a", {"key": "a", "value": "fresh"}, generation)
+    assert cache.get("a") == {"key": "a", "value": "fresh"}
+
+
+def test_invalidation_of_other_key_does_not_drop_put():
+    cache = make_cache()
+    generation = cache.generation()
+    cache.invalidate("b")
+    cache.put("a", {"key": "a"}, generation)
+    assert cache.get("a") == {"key": "a"}
+
+
+def test_put_after_full_invalidation_is_dropped():
+    cache = make_cache()
+    cache.put("a", {"key": "a"})
+    generation = cache.generation()
+    cache.invalidate()
+    assert cache.get("a") is None
+
+    cache.put("b", {"key": "b"}, generation)
+    assert cache.get("b") is None
+
+
+def test_pruned_invalidations_still_drop_older_puts():
+    cache = make_cache(max_size=1)
+    generation = cache.generation()
+    cache.invalidate("a")
+    # pushes "a" out of the invalidation log
+    cache.invalidate("b")
+
+    cache.put("a", {"key": "a"}, generation)
+    assert cache.get("a") is None
+
+
+def test_invalidate_notifies_listeners():
+    cache = make_cache()
+    calls = []
+    cache.add_listener(calls.append)
+
+    def failing(key):
+        raise RuntimeError("listener failed")
+    cache.add_listener(failing)
+    cache.add_listener(lambda key: calls.append(("after", key)))
+
+    cache.invalidate("a")
+    cache.invalidate()
+    assert calls == ["a", ("after", "a"), None, ("after", None)]
+
+
+def test_evicted_documents_forget_their_id():
+    cache = make_cache(max_size=1)
+    cache.put("a", {"_id": 1, "key": "a"})
+    assert cache._ids == {1: "a"}
+
+    cache.put("b", {"_id": 2, "key": "b"})
+    assert cache._ids == {2: "b"}
+
+    cache.invalidate("b")
+    assert cache._ids == {}
+
+
+def test_change_of_uncached_document_is_resolved_by_id():
+    cache = make_cache()
+    cache.put("a", {"_id": 1, "key": "a"})
+    invalidated = []
+    cache.add_listener(invalidated.append)
+
+    cache._handle_change({"operationType": "delete", "documentKey": {"_id": 1}})
+    cache._handle_change({"operationType": "delete", "documentKey": {"_id": 2}})
+    cache._handle_change({"operationType": "update", "documentKey": {"_id": 3}})
+    assert invalidated == ["a", None]
+
+
+def test_disabled_cache_stores_nothing():
+    cache = MetadataCache("documents", "key", max_size=16, ttl=60,
+                          poll_interval=1.0, enabled=False)
+    cache.put("a", {"key": "a"})
+    assert cache.get("a") is None
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import core.async_runtime as async_runtime
+import core.graph as graph
+from core.plan import compile_plan
+from core.schema import Graph
+
+
+def make_plan(connections, metadata=None):
+    function_ids = list(dict.fromkeys(
+        [src for src in connections] +
+        [tgt for targets in connections.values() for tgt in targets]))
+    return compile_plan(Graph.from_dict({
+        "graph_name": "graph",
+        "graph_version": "1.0",
+        "graph_release_tag": "test",
+        "graph_metadata": metadata or {},
+        "graph_function_ids": function_ids,
+        "graph_connection_data": connections,
+        "graph_search_tags": [],
+        "graph_description": "",
+        "graph_input_schema": {},
+        "graph_output_schema": {},
+    }))
+
+
+def wide(width):
+    branches = [f"branch-{index}" for index in range(width)]
+    connections = {"source": branches}
+    for branch in branches:
+        connections[branch] = ["sink"]
+    return connections
+
+
+class FakeNodes:
+    """Stands in for the executor calls, recording how many ran at once."""
+
+    def __init__(self, delay=0.05, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.started = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _enter(self, function_id):
+        with self._lock:
+            self.started.append(function_id)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def output(self, function_id, inputs):
+        if function_id in self.failing:
+            raise RuntimeError(f"{function_id} failed")
+        return {"node": function_id, "inputs": inputs}
+
+    def call(self, plan, function_id, inputs):
+        self._enter(function_id)
+        try:
+            time.sleep(self.delay)
+            return self.output(function_id, inputs)
+        finally:
+            self._exit()
+
+    async def call_async(self, plan, function_id, inputs):
+        self._enter(function_id)
+        try:
+            await asyncio.sleep(self.delay)
+            return self.output(function_id, inputs)
+        finally:
+            self._exit()
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    fake = FakeNodes()
+    monkeypatch.setattr(graph, "call_node", fake.call)
+    monkeypatch.setattr(async_runtime, "call_node_async", fake.call_async)
+    return fake
+
+
+def test_run_graph_runs_ready_nodes_concurrently(nodes):
+    plan = make_plan(wide(4))
+
+    started = time.perf_counter()
+    results = {result.function_id: result
+               for result in graph.run_graph(plan, {"x": 1})}
+    elapsed = time.perf_counter() - started
+
+    assert nodes.peak == 4
+    # source, the branches together, then the sink
+    assert elapsed < 4 * nodes.delay * 2
+    assert nodes.started[0] == "source" and nodes.started[-1] == "sink"
+    assert results["sink"].output["inputs"] == [
+        {"node": f"branch-{index}", "inputs": {"node": "source", "inputs": {"x": 1}}}
+        for index in range(4)]
+
+
+def test_run_graph_respects_max_concurrency(nodes):
+    plan = make_plan(wide(6), metadata={"max_concurrency": 2})
+    list(graph.run_graph(plan, {"x": 1}))
+    assert nodes.peak == 2
+
+    nodes.peak = 0
+    list(graph.run_graph(plan, {"x": 1}, max_concurrency=3))
+    assert nodes.peak == 3
+
+
+def test_run_graph_fails_fast(nodes):
+    nodes.failing = {"branch-0"}
+    plan = make_plan(wide(6))
+
+    with pytest.raises(RuntimeError, match="branch-0 failed"):
+        list(graph.run_graph(plan, {"x": 1}, max_concurrency=1))
+    # nothing after the failing node was started
+    assert nodes.started == ["source", "branch-0"]
+
+
+def test_closing_run_graph_cancels_queued_nodes(nodes):
+    plan = make_plan(wide(6))
+    run = graph.run_graph(plan, {"x": 1}, max_concurrency=2)
+
+    assert next(run).function_id == "source"
+    assert next(run).function_id.startswith("branch-")
+    run.close()
+    time.sleep(nodes.delay * 3)
+    assert nodes.started == ["source", "branch-0", "branch-1"]
+
+
+def test_execute_graph_async_returns_leaf_output(nodes, monkeypatch):
+    plan = make_plan({"a": ["b"], "b": ["c"]})
+
+    async def get_plan(graph_uri):
+        return plan
+    monkeypatch.setattr(async_runtime, "get_execution_plan_async", get_plan)
+
+    output = asyncio.run(async_runtime.execute_graph_async(plan.graph_uri, {"x": 1}))
+    assert output["node"] == "c"
+    assert nodes.started == ["a", "b", "c"]
+
+
+def test_execute_graph_async_cancels_siblings_on_failure(nodes, monkeypatch):
+    plan = make_plan(wide(4))
+
+    async def get_plan(graph_uri):
+        return plan
+    monkeypatch.setattr(async_runtime, "get_execution_plan_async", get_plan)
+
+    cancelled = []
+    call_async = nodes.call_async
+
+    async def call_node_async(plan, function_id, inputs):
+        if function_id == "branch-0":
+            await asyncio.sleep(0)
+            raise RuntimeError("branch-0 failed")
+        try:
+            return await call_async(plan, function_id, inputs)
+        except asyncio.CancelledError:
+            cancelled.append(function_id)
+            raise
+    monkeypatch.setattr(async_runtime, "call_node_async", call_node_async)
+
+    async def run():
+        with pytest.raises(Exception, match="branch-0 failed"):
+            await async_runtime.execute_graph_async(plan.graph_uri, {"x": 1})
+        # let the cancellations be delivered
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert sorted(cancelled) == ["branch-1", "branch-2", "branch-3"]
+    assert "sink" not in nodes.started
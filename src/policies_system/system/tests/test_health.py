@@ -0,0 +1,118 @@
+import asyncio
+
+import httpx
+import pytest
+
+from core.health import CircuitBreaker, ExecutorUnavailable, circuit_breakers
+from core.async_runtime import AsyncExecutorProxyClient
+
+
+def make_breaker(failure_threshold=3, reset_timeout=0.0):
+    return CircuitBreaker("http://executor", failure_threshold, reset_timeout)
+
+
+def call(breaker, status_code):
+    with breaker.attempt():
+        breaker.record_status(status_code)
+
+
+def test_opens_after_failure_threshold():
+    breaker = make_breaker(reset_timeout=60)
+    for _ in range(2):
+        call(breaker, 503)
+        assert breaker.state == CircuitBreaker.CLOSED
+    call(breaker, 503)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(ExecutorUnavailable):
+        call(breaker, 200)
+
+
+def test_success_resets_failure_count():
+    breaker = make_breaker()
+    call(breaker, 503)
+    call(breaker, 503)
+    call(breaker, 200)
+    call(breaker, 503)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 1
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = make_breaker(failure_threshold=1)
+    call(breaker, 503)
+
+    with breaker.attempt():
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(ExecutorUnavailable):
+            call(breaker, 200)
+        breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens():
+    breaker = make_breaker(failure_threshold=5)
+    breaker.failures = 4
+    call(breaker, 503)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    call(breaker, 502)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_trial_without_outcome_is_released():
+    breaker = make_breaker(failure_threshold=1)
+    call(breaker, 503)
+
+    with pytest.raises(ValueError):
+        with breaker.attempt():
+            raise ValueError("not about the executor")
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    call(breaker, 200)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stale_release_keeps_the_current_trial():
+    breaker = make_breaker(failure_threshold=1)
+    call(breaker, 503)
+
+    first = breaker._admit()
+    breaker.record_failure()
+    second = breaker._admit()
+    breaker.release_trial(first)
+    with pytest.raises(ExecutorUnavailable):
+        breaker._admit()
+    breaker.release_trial(second)
+    assert breaker._admit() is not None
+
+
+def test_cancelled_async_trial_is_released():
+    uri = "http://cancelled-trial"
+    breaker = circuit_breakers.get(uri)
+    breaker.reset_timeout = 0
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    async def respond(request):
+        return httpx.Response(200, json={"success": True, "data": {"ok": True}})
+
+    async def main():
+        client = AsyncExecutorProxyClient(uri)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(hang))
+        trial = asyncio.create_task(client.call_function("f", {}))
+        await asyncio.sleep(0.05)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        return await client.call_function("f", {})
+
+    assert asyncio.run(main()) == {"ok": True}
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+import core.job_events as job_events
+from core.job_events import JobEventHub
+
+
+class FakeJob:
+    def __init__(self, document):
+        self.document = dict(document)
+
+    def to_dict(self):
+        return self.document
+
+
+@pytest.fixture
+def job(monkeypatch):
+    """A job whose stored state the test changes without publishing an event."""
+    state = {"job_id": "job-1", "job_status": "running"}
+
+    class FakeJobsDB:
+        def read(self, job_id):
+            return FakeJob(state) if job_id == state["job_id"] else None
+
+    monkeypatch.setattr(job_events, "PolicyJobsDB", FakeJobsDB)
+    return state
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = JobEventHub("redis://unused", "JOB_EVENTS", recheck_interval=0.1)
+    monkeypatch.setattr(hub, "_ensure_subscriber", lambda: None)
+    return hub
+
+
+def finish_later(job, status, delay):
+    threading.Timer(delay, lambda: job.update(job_status=status)).start()
+
+
+def test_wait_returns_published_update(hub, job):
+    threading.Timer(0.05, lambda: hub.dispatch(
+        {"job_id": "job-1", "job_status": "completed"})).start()
+    assert hub.wait("job-1", timeout=5)["job_status"] == "completed"
+
+
+def test_wait_rechecks_the_database_without_an_event(hub, job):
+    finish_later(job, "completed", 0.2)
+    started = time.monotonic()
+    assert hub.wait("job-1", timeout=5)["job_status"] == "completed"
+    assert time.monotonic() - started < 1
+
+
+def test_wait_reads_the_job_at_the_deadline(hub, job):
+    hub.recheck_interval = 60
+    finish_later(job, "failed", 0.1)
+    assert hub.wait("job-1", timeout=0.3)["job_status"] == "failed"
+
+
+def test_stream_rechecks_between_heartbeats(hub, job):
+    finish_later(job, "completed", 0.2)
+    started = time.monotonic()
+    updates = list(hub.stream("job-1", timeout=5, heartbeat=10))
+    assert [update["job_status"] for update in updates] == ["running", "completed"]
+    assert time.monotonic() - started < 1
+
+
+def test_stream_yields_heartbeats_only_when_due(hub, job):
+    hub.recheck_interval = 0.02
+    finish_later(job, "completed", 0.35)
+    updates = list(hub.stream("job-1", timeout=5, heartbeat=0.1))
+    heartbeats = [update for update in updates if update is None]
+    assert updates[-1]["job_status"] == "completed"
+    assert 2 <= len(heartbeats) <= 4
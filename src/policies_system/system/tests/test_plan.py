@@ -0,0 +1,130 @@
+import pytest
+
+from core.plan import PlanCache, compile_plan, is_dag
+from core.schema import Graph
+
+
+def graph_document(connections, function_ids=None, metadata=None, name="graph"):
+    if function_ids is None:
+        function_ids = list(dict.fromkeys(
+            [src for src in connections] +
+            [tgt for targets in connections.values() for tgt in targets]))
+    return {
+        "graph_name": name,
+        "graph_version": "1.0",
+        "graph_release_tag": "test",
+        "graph_metadata": metadata or {},
+        "graph_function_ids": function_ids,
+        "graph_connection_data": connections,
+        "graph_search_tags": [],
+        "graph_description": "",
+        "graph_input_schema": {},
+        "graph_output_schema": {},
+    }
+
+
+def compile_document(document):
+    return compile_plan(Graph.from_dict(document))
+
+
+# source -> a, b -> sink, and a -> b
+DIAMOND = {"source": ["a", "b"], "a": ["b", "sink"], "b": ["sink"]}
+
+
+def test_is_dag():
+    assert is_dag(DIAMOND)
+    assert not is_dag({"a": ["b"], "b": ["c"], "c": ["a"]})
+
+
+def test_compile_plan_levels_and_predecessors():
+    plan = compile_document(graph_document(DIAMOND))
+
+    assert plan.graph_uri == "graph:1.0-test"
+    assert plan.roots == ["source"]
+    assert plan.levels == [["source"], ["a"], ["b"], ["sink"]]
+    assert plan.leaf_node == "sink"
+    assert plan.in_degree == {"source": 0, "a": 1, "b": 2, "sink": 2}
+    assert plan.predecessors == {"a": ["source"], "b": ["source", "a"],
+                                 "sink": ["a", "b"]}
+    assert plan.max_concurrency is None
+
+
+def test_compile_plan_node_inputs():
+    plan = compile_document(graph_document(DIAMOND))
+    outputs = {"source": 1, "a": 2, "b": 3}
+
+    assert plan.node_inputs("source", {}, {"x": 0}) == {"x": 0}
+    assert plan.node_inputs("a", outputs, {"x": 0}) == 1
+    assert plan.node_inputs("sink", outputs, {"x": 0}) == [2, 3]
+
+
+def test_compile_plan_reads_max_concurrency():
+    plan = compile_document(graph_document(
+        DIAMOND, metadata={"max_concurrency": "4"}))
+    assert plan.max_concurrency == 4
+
+
+def test_compile_plan_rejects_cycles():
+    with pytest.raises(Exception, match="not a Directed Acyclic Graph"):
+        compile_document(graph_document({"a": ["b"], "b": ["a"]}))
+
+
+def test_compile_plan_requires_single_leaf():
+    with pytest.raises(Exception, match="exactly one leaf"):
+        compile_document(graph_document({"a": ["b", "c"]}))
+
+
+def test_plan_cache_reuses_plan_of_same_document():
+    cache = PlanCache(max_size=8)
+    document = graph_document(DIAMOND)
+
+    plan = cache.get_or_compile("graph:1.0-test", document)
+    assert cache.get_or_compile("graph:1.0-test", document) is plan
+
+    # a re-read document is a new object, even with equal contents
+    changed = graph_document({"a": ["b"]})
+    recompiled = cache.get_or_compile("graph:1.0-test", changed)
+    assert recompiled is not plan
+    assert recompiled.leaf_node == "b"
+    assert cache.get("graph:1.0-test") is recompiled
+
+
+def test_plan_cache_is_bounded():
+    cache = PlanCache(max_size=2)
+    for index in range(3):
+        cache.get_or_compile(f"graph-{index}", graph_document(DIAMOND))
+
+    assert cache.get("graph-0") is None
+    assert cache.get("graph-1") is not None
+    assert cache.get("graph-2") is not None
+
+
+def test_plan_cache_invalidate_graph():
+    cache = PlanCache(max_size=8)
+    cache.get_or_compile("graph-0", graph_document(DIAMOND))
+    cache.get_or_compile("graph-1", graph_document(DIAMOND))
+
+    cache.invalidate_graph("graph-0")
+    assert cache.get("graph-0") is None
+    assert cache.get("graph-1") is not None
+
+    cache.invalidate_graph()
+    assert cache.get("graph-1") is None
+
+
+def test_plan_cache_invalidate_function_drops_endpoints():
+    cache = PlanCache(max_size=8)
+    plan = cache.get_or_compile("graph-0", graph_document(DIAMOND))
+    plan.set_endpoints(list(plan.in_degree), {
+        function_id: {"function_id": function_id,
+                      "function_executor_uri": "http://executor"}
+        for function_id in plan.in_degree})
+    assert plan.unresolved_endpoints() == []
+
+    cache.invalidate_function("a")
+    assert plan.unresolved_endpoints() == ["a"]
+
+    cache.invalidate_function()
+    assert plan.endpoints == {}
+    # the plan itself is kept
+    assert cache.get("graph-0") is plan